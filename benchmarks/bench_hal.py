@@ -0,0 +1,70 @@
+"""Measures the CPU time and memory needed to build a page of HAL items with
+embedded objects, links and curies.
+
+Run from the repository root:
+
+    python benchmarks/bench_hal.py [number of embedded items]
+"""
+import sys
+import timeit
+import tracemalloc
+
+from django.conf import settings
+
+settings.configure(ALLOWED_HOSTS=['testserver'])
+
+from django.test import RequestFactory
+
+from restutils.hal import Representation, Link
+
+
+class PersonRepresentation(Representation):
+    curies = {'cr': '/docs/{rel}.html'}
+
+
+def build_page(request, size):
+    doc = PersonRepresentation(request)
+    doc.add_link('self', '/persons/?page=2')
+    doc.add_link('next', '/persons/?page=3')
+    doc.add_link('previous', '/persons/?page=1')
+    doc.add_link('cr:search', Link(href='/persons/{?q}', title='Search'))
+    items = []
+    for ix in range(size):
+        item = PersonRepresentation(request)
+        item.add_link('self', '/persons/%d/' % ix)
+        item.add_link('cr:profile', '/persons/%d/profile/' % ix)
+        item.add_link_list('cr:pets', ['/pets/%d/' % ix, '/pets/%d/' % -ix])
+        item.add_property('id', ix)
+        item.add_property('name', 'Person %d' % ix)
+        items.append(item)
+    doc.add_object_list('cr:person', items)
+    return doc
+
+
+def best_time(function, repeat):
+    return min(timeit.repeat(function, number=repeat, repeat=3)) / repeat
+
+
+def measure(label, request, size):
+    repeat = max(1, 20000 // size)
+    build = best_time(lambda: build_page(request, size), repeat)
+    total = best_time(lambda: build_page(request, size).to_dict(), repeat)
+    tracemalloc.start()
+    doc = build_page(request, size)
+    retained, _ = tracemalloc.get_traced_memory()
+    doc.to_dict()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('%s, %d embedded items:' % (label, size))
+    print('    build %.2f ms, build + to_dict %.2f ms' % (
+        build * 1000, total * 1000))
+    print('    %.1f KiB retained after build, %.1f KiB peak' % (
+        retained / 1024, peak / 1024))
+
+
+def main(size):
+    measure('HAL page', RequestFactory().get('/persons/'), size)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,66 @@
+"""Compares the throughput of the JSON encoder backends on large HAL documents.
+
+Run from the repository root:
+
+    python benchmarks/bench_json_encoding.py [number of embedded items]
+"""
+import sys
+import json
+import timeit
+
+from django.conf import settings
+
+settings.configure(ALLOWED_HOSTS=['testserver'])
+
+from django.test import RequestFactory
+
+from restutils.hal import Representation
+from restutils.lib.json_encoding import encoders
+
+
+class PersonRepresentation(Representation):
+    curies = {'cr': '/docs/{rel}.html'}
+
+
+def build_document(request, size):
+    doc = PersonRepresentation(request)
+    doc.add_link('self', '/persons/')
+    items = []
+    for ix in range(size):
+        item = PersonRepresentation(request)
+        item.add_link('self', '/persons/%d/' % ix)
+        item.add_link('cr:profile', '/persons/%d/profile/' % ix)
+        item.add_property('id', ix)
+        item.add_property('name', 'Persön %d' % ix)
+        item.add_property('active', ix % 2 == 0)
+        item.add_property('score', ix * 1.5)
+        items.append(item)
+    doc.add_object_list('cr:person', items)
+    return doc.to_dict()
+
+
+def indented_dumps(data):
+    # What json_view and Representation.to_json used to do on every response
+    return json.dumps(data, indent=4, ensure_ascii=False).encode('utf-8')
+
+
+def main(size):
+    request = RequestFactory().get('/persons/')
+    data = build_document(request, size)
+    candidates = [('json (indent=4)', indented_dumps)]
+    candidates += list(encoders.items())
+    repeat = max(1, 20000 // size)
+    baseline = None
+    print('%d embedded items, %d iterations' % (size, repeat))
+    for name, dumps in candidates:
+        seconds = min(timeit.repeat(lambda: dumps(data), number=repeat,
+                                    repeat=3))
+        per_second = repeat / seconds
+        if baseline is None:
+            baseline = per_second
+        print('%-16s %10.1f docs/s %8.1fx  %d bytes' % (
+            name, per_second, per_second / baseline, len(dumps(data))))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,14 @@
+"""Minimal Django settings for the benchmark suite."""
+
+SECRET_KEY = 'benchmarks'
+DEBUG = False
+ALLOWED_HOSTS = ['testserver']
+ROOT_URLCONF = 'benchmark_urls'
+USE_TZ = True
+INSTALLED_APPS = []
+DATABASES = {}
+MIDDLEWARE = [
+    'restutils.middleware.MagicReverseMiddleware',
+    'restutils.middleware.RequestDataMiddleware',
+    'restutils.middleware.VndErrorMiddleware',
+]
@@ -0,0 +1,80 @@
+"""The URLconf of the benchmark suite, with a routed resource that returns HAL
+pages of a requested size."""
+
+from django.http import HttpResponse
+
+try:
+    from django.urls import include, re_path as url
+except ImportError:
+    from django.conf.urls import include, url
+
+from restutils.decorators import json_view
+from restutils.exceptions import NotFound
+from restutils.hal import Representation, Link
+from restutils.router import RoutableResourceMixin
+
+
+class PersonRepresentation(Representation):
+    curies = {'cr': '/docs/{rel}.html'}
+
+
+def person_representation(request, ix):
+    item = PersonRepresentation(request)
+    item.add_link('self', '/persons/%d/' % ix)
+    item.add_link('cr:profile', '/persons/%d/profiles/1/' % ix)
+    item.add_link_list('cr:pets', ['/pets/%d/' % ix, '/pets/%d/' % -ix])
+    item.add_property('id', ix)
+    item.add_property('name', 'Persön %d' % ix)
+    item.add_property('active', ix % 2 == 0)
+    return item
+
+
+def build_page(request, size):
+    doc = PersonRepresentation(request)
+    doc.add_link('self', '/persons/')
+    doc.add_link('cr:search', Link(href='/persons/{?q}', title='Search'))
+    doc.add_object_list('cr:person', [person_representation(request, ix)
+                                      for ix in range(size)])
+    return doc
+
+
+def build_data(size):
+    return {'items': [{'id': ix, 'name': 'Persön %d' % ix, 'score': ix * 1.5}
+                      for ix in range(size)]}
+
+
+class PersonView(RoutableResourceMixin):
+
+    @json_view
+    def index(self, request):
+        return build_page(request, int(request.GET.get('size', 10)))
+
+    @json_view
+    def show(self, request, person_id):
+        if person_id == '0':
+            raise NotFound("No such person", logref=person_id)
+        doc = person_representation(request, int(person_id))
+        doc.add_link('collection', request.rev('person-list'))
+        return doc
+
+
+person_view = PersonView()
+
+
+@json_view
+def data_view(request):
+    return build_data(int(request.GET.get('size', 10)))
+
+
+def profile_view(request, person_id, profile_id):
+    return HttpResponse(b'')
+
+
+urlpatterns = [
+    url(r'^persons/(?P<person_id>\d+)/profiles/(?P<profile_id>\d+)/$',
+        profile_view, name='person-profile'),
+    url(r'^persons/(?P<person_id>\d+)/',
+        include(person_view.item_urls(prefix='person'))),
+    url(r'^persons/', include(person_view.list_urls(prefix='person'))),
+    url(r'^data/$', data_view, name='data'),
+]
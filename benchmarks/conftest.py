@@ -0,0 +1,16 @@
+import os
+import sys
+
+try:
+    import pytest_benchmark
+except ImportError:
+    # The suite needs the pytest-benchmark plugin, don't fail test runs that
+    # happen to collect this directory
+    collect_ignore = ['test_hot_path.py']
+else:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmark_settings')
+
+    import django
+    django.setup()
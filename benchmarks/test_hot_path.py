@@ -0,0 +1,182 @@
+"""Benchmarks of the request/response hot path, at several payload sizes.
+
+Needs pytest-benchmark. Run from the repository root:
+
+    pytest benchmarks
+
+Every run is saved as JSON in .benchmarks/. To see whether a change is a
+regression, compare with an earlier run:
+
+    pytest benchmarks --benchmark-compare=0001
+"""
+import datetime
+
+import pytest
+
+from django.http import HttpResponse
+from django.test import Client, RequestFactory
+from django.urls import resolve
+
+from restutils.exceptions import NotFound
+from restutils.lib.content_negotiation import best_content_type
+from restutils.magicreverse import MagicReverser
+from restutils.middleware import VndErrorMiddleware
+from restutils.router import Route
+from restutils.serializers import ResourceSchema
+from restutils.utils import extract_from_uri, iso_date, iso_dates
+from restutils.validation import BodySchema, Array, Integer, String
+
+from benchmark_urls import build_page, PersonRepresentation
+
+SIZES = [1, 10, 100, 1000]
+
+ACCEPT_HEADERS = [
+    'application/json',
+    'application/hal+json, application/json;q=0.9',
+    'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+]
+
+
+@pytest.fixture
+def client():
+    return Client()
+
+
+@pytest.fixture
+def request_factory():
+    return RequestFactory()
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_json_view(benchmark, client, size):
+    path = '/data/?size=%d' % size
+    response = benchmark(client.get, path)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_json_view_hal(benchmark, client, size):
+    path = '/persons/?size=%d' % size
+    response = benchmark(client.get, path, HTTP_ACCEPT='application/hal+json')
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_representation_build(benchmark, request_factory, size):
+    request = request_factory.get('/persons/')
+    benchmark(build_page, request, size)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_representation_to_json(benchmark, request_factory, size):
+    request = request_factory.get('/persons/')
+    benchmark(lambda: build_page(request, size).to_json())
+
+
+person_schema = ResourceSchema(
+    fields=['id', 'name'],
+    links={
+        'self': {'route': 'person-item', 'kwargs': {'person_id': 'id'}},
+        'cr:profile': {'route': 'person-profile',
+                       'kwargs': {'person_id': 'id', 'profile_id': 'id'}},
+    },
+    curies={'cr': '/docs/{rel}.html'})
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_resource_schema_to_json(benchmark, request_factory, size):
+    request = request_factory.get('/persons/')
+    rows = [{'id': ix, 'name': 'Persön %d' % ix} for ix in range(size)]
+
+    def build():
+        doc = PersonRepresentation(request)
+        doc.add_link('self', '/persons/')
+        person_schema.add_object_list(doc, 'cr:person', rows)
+        return doc.to_json()
+
+    benchmark(build)
+
+
+@pytest.mark.parametrize('accept', ACCEPT_HEADERS)
+def test_best_content_type(benchmark, accept):
+    benchmark(best_content_type, 'hal+json', accept)
+
+
+@pytest.mark.parametrize('accept', ACCEPT_HEADERS)
+def test_best_content_type_uncached(benchmark, accept):
+    benchmark(best_content_type.__wrapped__, 'hal+json', accept)
+
+
+def test_process_exception(benchmark, request_factory):
+    middleware = VndErrorMiddleware(lambda request: None)
+    request = request_factory.get('/persons/0/')
+    exception = NotFound("No such person", logref='0', about='/persons/')
+    response = benchmark(middleware.process_exception, request, exception)
+    assert response.status_code == 404
+
+
+def test_process_exception_static(benchmark, request_factory):
+    middleware = VndErrorMiddleware(lambda request: None)
+    request = request_factory.get('/persons/0/')
+    response = benchmark(middleware.process_exception, request, NotFound())
+    assert response.status_code == 404
+
+
+def test_not_found(benchmark, client):
+    response = benchmark(client.get, '/persons/0/')
+    assert response.status_code == 404
+
+
+def test_magic_reverser_rev(benchmark, request_factory):
+    request = request_factory.get('/persons/12/')
+    request.resolver_match = resolve(request.path)
+    reverser = MagicReverser(request)
+    benchmark(reverser.rev, 'person-profile', profile_id=34)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_extract_from_uri(benchmark, size):
+    uris = ['http://testserver/persons/%d/profiles/%d/' % (ix, ix + 1)
+            for ix in range(size)]
+
+    def extract_all():
+        for uri in uris:
+            extract_from_uri(uri, ['person_id', 'profile_id'])
+
+    benchmark(extract_all)
+
+
+def test_route_dispatch(benchmark, request_factory):
+    route = Route()
+    route.add_handler('GET', lambda request: HttpResponse(b''))
+    route.add_handler('PUT', lambda request: HttpResponse(b''))
+    request = request_factory.get('/')
+    response = benchmark(route.dispatch, request)
+    assert response.status_code == 200
+
+
+def test_routed_request(benchmark, client):
+    response = benchmark(client.get, '/persons/12/')
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_iso_date(benchmark, size):
+    dates = [datetime.datetime(2020, 1, 2, 3, 4, ix % 60) for ix in range(size)]
+    benchmark(lambda: [iso_date(date) for date in dates])
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_iso_dates(benchmark, size):
+    dates = [datetime.datetime(2020, 1, 2, 3, 4, ix % 60) for ix in range(size)]
+    benchmark(iso_dates, dates)
+
+
+bulk_schema = BodySchema(Array({'id': Integer(min_value=0),
+                                'name': String(max_length=100)}))
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_body_schema_validate(benchmark, size):
+    data = [{'id': ix, 'name': 'Persön %d' % ix} for ix in range(size)]
+    benchmark(bulk_schema.validate, data)
@@ -0,0 +1,229 @@
+"""A view that handles a batch of requests in one round trip.
+
+The client POSTs a list of operations:
+
+    [
+        {"method": "GET", "path": "/persons/12/"},
+        {"method": "PUT", "path": "/persons/12/", "body": {"name": "Mary"}}
+    ]
+
+Every operation is resolved against the URLconf and dispatched in-process to
+its view, like a normal request (routes, json_view and all). The response holds
+the status code, the headers and the decoded body of every operation, in the
+order of the operations. ApiErrors become vnd.error bodies with the status code
+of the error, just like VndErrorMiddleware does for normal requests.
+
+The operations are not sent through the middleware. They get the user and
+session of the batch request, and the request.rev and request.data attributes
+of the restutils middleware."""
+
+import asyncio
+from io import BytesIO
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.http import Http404
+from django.urls import resolve
+
+try:
+    from asgiref.sync import async_to_sync
+    has_asgiref = True
+except ImportError:
+    has_asgiref = False
+
+from restutils.decorators import json_view
+from restutils.exceptions import ApiError, BadRequest, NotFound, Forbidden
+from restutils.hal import _in_transaction
+from restutils.lib.json_encoding import encode, decode
+from restutils.middleware import (MagicReverseMiddleware, RequestDataMiddleware,
+                                  VndErrorMiddleware)
+from restutils.utils import decode_json_data
+
+safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+methods = safe_methods + ('POST', 'PUT', 'PATCH', 'DELETE')
+
+# The operations negotiate their own content type and encoding, and are never
+# conditional
+_skipped_meta = frozenset([
+    'CONTENT_TYPE', 'CONTENT_LENGTH', 'HTTP_ACCEPT', 'HTTP_ACCEPT_ENCODING',
+    'HTTP_IF_MATCH', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE',
+    'HTTP_IF_UNMODIFIED_SINCE',
+])
+
+_accept = 'application/hal+json, application/vnd.error+json, application/json'
+
+# Attributes that authentication and session middleware set on the request
+_inherited_attributes = ('user', 'auser', 'session')
+
+
+def _no_response(request):
+    return None
+
+
+def _parse_operation(operation):
+    if not isinstance(operation, dict):
+        raise BadRequest("Every operation must be an object")
+    method = operation.get('method', 'GET')
+    path = operation.get('path')
+    if not isinstance(method, str) or method.upper() not in methods:
+        raise BadRequest("Invalid method: %s" % (method,))
+    if not isinstance(path, str) or not urlparse(path).path.startswith('/'):
+        raise BadRequest("Invalid path: %s" % (path,))
+    return method.upper(), path, operation.get('body')
+
+
+def _sub_request(request, method, path, body):
+    """Returns a request for the operation, with the headers of the batch
+    request."""
+    parts = urlparse(path)
+    path_info = parts.path
+    script_name = request.META.get('SCRIPT_NAME', '')
+    if script_name and path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    content = b'' if body is None else encode(body)
+
+    environ = {key: value for key, value in request.META.items()
+               if key not in _skipped_meta}
+    environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path_info,
+        'QUERY_STRING': parts.query,
+        'HTTP_ACCEPT': _accept,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(content)),
+        'wsgi.input': BytesIO(content),
+        # Not in the META of ASGI requests
+        'wsgi.url_scheme': request.scheme,
+    })
+    sub_request = WSGIRequest(environ)
+    for attribute in _inherited_attributes:
+        # Copy without evaluating lazy objects like request.user
+        if attribute in request.__dict__:
+            setattr(sub_request, attribute, request.__dict__[attribute])
+    return sub_request
+
+
+def _result(response):
+    if response.streaming:
+        content = b''.join(response.streaming_content)
+    else:
+        content = response.content
+    body = None
+    if content:
+        try:
+            body = decode(content)
+        except ValueError:
+            body = content.decode('utf-8', 'replace')
+    return {
+        'status': response.status_code,
+        'headers': dict(response.items()),
+        'body': body,
+    }
+
+
+class BatchView(object):
+    """Handles a POSTed list of operations. Consecutive reads (GET, HEAD and
+    OPTIONS operations) are run concurrently in a thread pool of max_workers
+    threads; other operations run one by one, in order, so a read after a
+    write sees its result. Without max_workers, or inside a transaction (like
+    with ATOMIC_REQUESTS), all operations run one by one.
+
+    The operations get the session of the batch request, so the batch request
+    itself goes through the CSRF protection, like any other POST. Only JSON
+    bodies are accepted: a cross-site form can post text/plain, but not
+    application/json."""
+
+    def __init__(self, max_operations=50, max_workers=None):
+        self.max_operations = max_operations
+        self.max_workers = max_workers
+        self._executor = None
+        if max_workers:
+            self._executor = ThreadPoolExecutor(max_workers)
+        self.request_middleware = (MagicReverseMiddleware(_no_response),
+                                   RequestDataMiddleware(_no_response))
+        self.error_middleware = VndErrorMiddleware(_no_response)
+
+    def dispatch(self, sub_request):
+        try:
+            match = resolve(sub_request.path_info)
+        except Http404:
+            raise NotFound()
+        if isinstance(match.func, BatchView):
+            raise BadRequest("Batch requests can't be nested")
+        sub_request.resolver_match = match
+        view = match.func
+        if asyncio.iscoroutinefunction(view):
+            if not has_asgiref:
+                raise ApiError("Coroutine views need asgiref")
+            view = async_to_sync(view)
+        return view(sub_request, *match.args, **match.kwargs)
+
+    def run(self, request, method, path, body):
+        sub_request = _sub_request(request, method, path, body)
+        for middleware in self.request_middleware:
+            middleware.process_request(sub_request)
+        try:
+            response = self.dispatch(sub_request)
+        except Exception as exception:
+            if isinstance(exception, Http404):
+                exception = NotFound()
+            elif isinstance(exception, PermissionDenied):
+                exception = Forbidden()
+            response = self.error_middleware.process_exception(sub_request,
+                                                               exception)
+            if response is None:
+                # An unexpected error: report it (the middleware fires the
+                # exception signal) and answer with an internal server error
+                response = self.error_middleware.process_exception(
+                    sub_request, ApiError())
+        return _result(response)
+
+    def _run_in_thread(self, request, method, path, body):
+        try:
+            return self.run(request, method, path, body)
+        finally:
+            # Database connections are per thread, so close the ones of this
+            # worker thread
+            connections.close_all()
+
+    def execute(self, request, operations):
+        results = []
+        reads = []
+        # The threads have database connections of their own, which don't see
+        # the uncommitted writes of a transaction
+        concurrent = self._executor is not None and not _in_transaction()
+        for operation in operations + [None]:
+            if (operation is not None and concurrent and
+                    operation[0] in safe_methods):
+                reads.append(operation)
+                continue
+            if len(reads) == 1:
+                results.append(self.run(request, *reads[0]))
+            elif reads:
+                futures = [self._executor.submit(self._run_in_thread, request,
+                                                 *read) for read in reads]
+                results.extend(future.result() for future in futures)
+            reads = []
+            if operation is not None:
+                results.append(self.run(request, *operation))
+        return results
+
+    @json_view
+    def __call__(self, request):
+        if request.method != 'POST':
+            raise ApiError("Method not allowed, use POST", status=405)
+        if request.content_type != 'application/json':
+            raise ApiError("Unsupported media type, use application/json",
+                           status=415)
+        operations = decode_json_data(request)
+        if not isinstance(operations, list):
+            raise BadRequest("Expected a list of operations")
+        if len(operations) > self.max_operations:
+            raise BadRequest("Too many operations, the maximum is %d" %
+                             self.max_operations)
+        operations = [_parse_operation(operation) for operation in operations]
+        return {'results': self.execute(request, operations)}
@@ -1,13 +1,34 @@
 import re
-import json
+import asyncio
+import numbers
+import hashlib
+from calendar import timegm
 from inspect import ismethod
-from functools import wraps
+from time import perf_counter
+from functools import wraps, partial
+from itertools import chain
+from collections.abc import Iterator
 
-from django.http import HttpRequest, HttpResponse
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+try:
+    from asgiref.sync import sync_to_async
+    has_asgiref = True
+except ImportError:
+    has_asgiref = False
 
 from restutils.hal import Representation
-from restutils.lib.json_as_html import create_html
-from restutils.lib.content_negotiation import best_content_type
+from restutils.lib.json_as_html import render_html
+from restutils.lib.json_encoding import (encode, decode, iter_encode_list,
+                                         buffered)
+from restutils.lib.response_cache import ResponseCache
+from restutils.lib.compression import (compression_level, accepts_gzip,
+                                       compress_response)
+from restutils.lib.content_negotiation import best_content_type, fallback_list
+from restutils.lib.timing import begin, end
+from restutils.lib import msgpack_encoding
 
 def _get_request(args):
     try:
@@ -23,7 +44,172 @@ def _get_request(args):
                          "missing)")
 
 
-def json_view(http_handler):
+def _serialize(content, pretty, encoder):
+    if isinstance(content, Representation):
+        return content.to_json(pretty=pretty, encoder=encoder)
+    if hasattr(content, 'to_json'):
+        content = content.to_json()
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        return content
+    return encode(content, pretty=pretty, encoder=encoder)
+
+
+def _to_data(item):
+    return item.to_dict() if isinstance(item, Representation) else item
+
+
+def _is_streaming(content):
+    if isinstance(content, Representation):
+        return content.is_streaming()
+    return isinstance(content, Iterator)
+
+
+def _iter_serialize(content, encoder):
+    if isinstance(content, Representation):
+        return content.iter_json(encoder=encoder)
+    return buffered(iter_encode_list(
+        (_to_data(item) for item in content), encoder=encoder))
+
+
+def _plain_data(content):
+    """Returns the content as lists, dicts and values."""
+    if isinstance(content, Iterator):
+        return [_to_data(item) for item in content]
+    if isinstance(content, Representation):
+        return content.to_dict()
+    if hasattr(content, 'to_json'):
+        return decode(_serialize(content, False, None))
+    return content
+
+
+def _html(content):
+    """Returns the html page for the content, or None and the content to
+    render as json instead when the page would be too large. Items of an
+    iterator are rendered as they come, and the ones that were consumed are
+    put back for the json."""
+    if isinstance(content, Iterator):
+        consumed = []
+        items = (_to_data(item) for item in content)
+        page = render_html(consumed.append(item) or item for item in items)
+        if page is None:
+            return None, chain(consumed, content)
+        return page, None
+    return render_html(_plain_data(content)), content
+
+
+def _render(content, status, accept_headers, encoder, timer=None,
+            head_only=False):
+    started = perf_counter()
+    optimal = 'hal+json' if isinstance(content, Representation) else 'json'
+    content_type = best_content_type(optimal, accept_headers)
+    if timer is not None:
+        timer.add('negotiate', started)
+        if isinstance(content, Representation):
+            timer.metrics['embedded'] = content.count_embedded()
+
+    if head_only and 'html' not in content_type:
+        # The body of a response to a HEAD request is never sent, so it isn't
+        # serialized. The response has no Content-Length (RFC 9110 allows
+        # that for HEAD), and is streaming so that no middleware adds a
+        # Content-Length of 0.
+        response = StreamingHttpResponse((), status=status)
+        response['Content-Type'] = content_type
+        response['Vary'] = 'Accept'
+        return response
+
+    binary = msgpack_encoding.is_msgpack(content_type)
+    page = None
+    if 'html' in content_type:
+        started = perf_counter()
+        page, content = _html(content)
+        if timer is not None:
+            timer.add('html', started)
+        if page is None:
+            # Too large for the browser view
+            content_type = fallback_list[optimal]
+
+    if page is not None:
+        response = HttpResponse(content=page, status=status)
+    elif binary:
+        # A MessagePack array starts with its length, so it isn't streamed
+        started = perf_counter()
+        content = msgpack_encoding.dumps(_plain_data(content))
+        if timer is not None:
+            timer.add('encode', started)
+        response = HttpResponse(content=content, status=status)
+    elif _is_streaming(content):
+        response = StreamingHttpResponse(
+            _iter_serialize(content, encoder), status=status)
+    else:
+        started = perf_counter()
+        content = _serialize(content, False, encoder)
+        if timer is not None:
+            timer.add('encode', started)
+        response = HttpResponse(content=content, status=status)
+
+    response['Content-Type'] = content_type
+    response['Vary'] = 'Accept'
+    return response
+
+
+def _variant(accept_headers):
+    # Identifies the representation before the view has run: the content
+    # type is negotiated for hal+json when the view returns a Representation
+    # and for json otherwise, so both are part of the variant
+    return '%s, %s' % (best_content_type('hal+json', accept_headers),
+                       best_content_type('json', accept_headers))
+
+
+def _make_etag(*parts):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part)
+    return quote_etag(digest.hexdigest())
+
+
+def _precomputed_validators(request, accept_headers, etag_func,
+                            last_modified_func, args, kwargs):
+    """Returns the ETag and the Last-Modified timestamp from the validator
+    functions. The ETag includes the negotiated content type, so that every
+    representation of the resource gets its own ETag."""
+    value = etag_func(*args, **kwargs) if etag_func else None
+    last_modified = None
+    if last_modified_func:
+        last_modified = last_modified_func(*args, **kwargs)
+        if last_modified is not None:
+            last_modified = timegm(last_modified.utctimetuple())
+    if value is None and last_modified is None:
+        return None, None
+    if value is None:
+        value = last_modified
+    etag = _make_etag(_variant(accept_headers).encode('utf-8'),
+                      str(value).encode('utf-8'))
+    return etag, last_modified
+
+
+def _strip_body(request, response):
+    """Removes the body of the response to a HEAD request that was
+    serialized anyway (for the response cache, a body ETag or compression).
+    The headers stay the same as for a GET request, including the
+    Content-Length."""
+    if request.method == 'HEAD' and not response.streaming:
+        content = response.content
+        if content:
+            response['Content-Length'] = str(len(content))
+            response.content = b''
+    return response
+
+
+def _set_validators(response, etag, last_modified):
+    if etag is not None and not response.has_header('ETag'):
+        response['ETag'] = etag
+    if last_modified is not None and not response.has_header('Last-Modified'):
+        response['Last-Modified'] = http_date(last_modified)
+
+
+def json_view(http_handler=None, encoder=None, etag=False, etag_func=None,
+              last_modified_func=None, cache=None, compress=None):
     """Returns a HttpResponse with a json representattion of the function
     result. You can use this on Django views to return json without having to
     use json.dumps() all the time. It also arranges a proper Content-type
@@ -44,8 +230,15 @@ def json_view(http_handler):
 
     For the json serialization, it first checks whether the returned object has
     a "to_json" method. When it does, this is called. Otherwise, it will use
-    json.dumps(), which works fine for lists or dictionaries, but will fail for
-    custom types.
+    the JSON encoder from restutils.lib.json_encoding, which works fine for
+    lists or dictionaries, but will fail for custom types. The output is
+    compact; only the html browser view is pretty printed. To use a specific
+    encoder backend for a view, pass its name (or an encoding function that
+    returns bytes):
+
+    @json_view(encoder='json')
+    def my_view(request):
+        return {"key": value}
 
     The system will inspect the clients HTTP_ACCEPT header to determine the
     proper Content-type header to return. If you return a
@@ -54,36 +247,214 @@ def json_view(http_handler):
     When this is not accepted by the client or when another type of object is
     returned, it will use "application/json". When the client explicitely
     requests "text/html", the json will be color coded and embedded in an html
-    page.
+    page. When the msgpack package is installed, clients can also ask for
+    "application/hal+msgpack" or "application/msgpack".
+
+    Large collections can be streamed: when the view returns an iterator (for
+    example a generator or QuerySet.iterator()), or a Representation with an
+    object list that was added as an iterator, the items are encoded one by
+    one into a StreamingHttpResponse. The html view is never streamed, and
+    plain json is returned instead when the html page would be larger than
+    the RESTUTILS_HTML_MAX_SIZE setting.
+
+    Conditional requests are supported in two ways. With etag=True, the ETag
+    is a hash of the serialized response and the body is not sent when the
+    client already has it. This saves bandwidth, but the view still runs. To
+    skip the view as well, pass functions that compute a cheap validator
+    from the view arguments, like a version number or a modification date:
+
+    @json_view(etag_func=lambda request, person_id: get_version(person_id),
+               last_modified_func=lambda request, person_id: get_date(person_id))
+    def my_view(request, person_id):
+        return {"key": value}
+
+    A 304 Not Modified response is returned when the If-None-Match or
+    If-Modified-Since headers of the request match. The ETag always depends on
+    the negotiated Content-type as well. Streamed responses get no ETag when
+    etag=True.
+
+    To cache the serialized responses on the server, pass the number of
+    seconds to keep them in an in-process cache (cache=True keeps them for
+    the default 60 seconds), or a restutils.lib.response_cache.ResponseCache
+    object that uses one of the django caches:
+
+    @json_view(cache=ResponseCache(timeout=300, backend='default'))
+    def my_view(request):
+        return {"key": value}
+
+    Responses are cached per path, query string and negotiated Content-type.
+    Use restutils.lib.response_cache.invalidate_route to remove the cached
+    responses of a route.
+
+    Responses are gzip compressed for clients that accept it when the
+    RESTUTILS_COMPRESSION setting is True, or when you pass compress=True (or
+    a zlib compression level). Pass compress=False to never compress the
+    responses of a view. Cached responses are stored compressed, so they are
+    compressed only once.
+
+    Coroutine views (async def) are awaited, and the decorated view is a
+    coroutine function as well, so that Django runs it asynchronously. Their
+    etag_func and last_modified_func, and the django cache backend of their
+    ResponseCache, are called in a thread, so they can use the database.
+    The deferred embedded objects of the Representations they return are
+    produced concurrently, with asyncio.gather.
+
+    With the RESTUTILS_TIMING setting, the time spent in the view, the
+    content negotiation, the html rendering, the encoding and the compression
+    is reported in a Server-Timing header and with the
+    restutils.lib.timing.request_timed signal. Streamed responses are encoded
+    after the view returns, so their encoding is not timed.
     """
 
-    @wraps(http_handler)
-    def wrapper(*args, **kwargs):
-        request = _get_request(args)
-        accept_headers = request.META.get('HTTP_ACCEPT', 'application/json')
-        output = http_handler(*args, **kwargs)
-        try:
-            content, status = output
-        except:
-            content, status = output, 200
+    if http_handler is None:
+        return partial(json_view, encoder=encoder, etag=etag,
+                       etag_func=etag_func,
+                       last_modified_func=last_modified_func, cache=cache,
+                       compress=compress)
 
-        if hasattr(content, 'to_json'):
-            content = content.to_json()
-        else:
-            content = json.dumps(content, indent=4)
+    if isinstance(cache, bool):
+        cache = ResponseCache() if cache else None
+    elif isinstance(cache, numbers.Real):
+        cache = ResponseCache(timeout=cache)
 
-        if isinstance(content, Representation):
-            content_type = best_content_type('hal+json', accept_headers)
+    def render(request, output, accept_headers, validators, timer):
+        # Don't unpack anything but a tuple, or we would consume iterators
+        if isinstance(output, tuple) and len(output) == 2:
+            content, status = output
         else:
-            content_type = best_content_type('json', accept_headers)
+            content, status = output, 200
 
-        if 'html' in content_type:
-            content=create_html(content)
+        # Without the response cache, a hash of the body or compression,
+        # nothing needs the body of a HEAD response
+        head_only = (request.method == 'HEAD' and not etag and
+                     not use_cache(request) and
+                     compression_level(compress) is None)
+        response = _render(content, status, accept_headers, encoder, timer,
+                           head_only)
 
-        response = HttpResponse(content=content, status=status)
-        response['Content-Type'] = content_type
-        response['Vary'] = 'Accept'
+        if (request.method in ('GET', 'HEAD') and
+                200 <= response.status_code < 300):
+            etag_value, last_modified = validators
+            if etag and etag_value is None and not response.streaming:
+                etag_value = _make_etag(
+                    response['Content-Type'].encode('utf-8'),
+                    response.content)
+            _set_validators(response, etag_value, last_modified)
 
+        level = compression_level(compress)
+        if level is not None:
+            started = perf_counter()
+            response = compress_response(request, response, level)
+            if timer is not None:
+                timer.add('compress', started)
         return response
 
+    def cache_variant(request, accept_headers):
+        variant = _variant(accept_headers)
+        if compression_level(compress) is not None and accepts_gzip(request):
+            variant += '; gzip'
+        return variant
+
+    def prepare(args, kwargs):
+        """Returns the request, its Accept header, the precomputed validators
+        and a response when the request can be answered without the view."""
+        request = _get_request(args)
+        accept_headers = request.META.get('HTTP_ACCEPT', 'application/json')
+
+        validators = None, None
+        if etag_func or last_modified_func:
+            validators = _precomputed_validators(
+                request, accept_headers, etag_func, last_modified_func,
+                args, kwargs)
+            response = get_conditional_response(
+                request, etag=validators[0], last_modified=validators[1])
+            if response is not None:
+                _set_validators(response, *validators)
+                response['Vary'] = 'Accept'
+                return request, accept_headers, validators, response
+        return request, accept_headers, validators, None
+
+    async def aprepare(args, kwargs):
+        if has_asgiref and (etag_func or last_modified_func):
+            # The validator functions usually query the database, which
+            # can't be done from the event loop
+            return await sync_to_async(prepare)(args, kwargs)
+        return prepare(args, kwargs)
+
+    def use_cache(request):
+        return cache is not None and request.method in ('GET', 'HEAD')
+
+    def conclude(request, response, validators):
+        if etag and request.method in ('GET', 'HEAD'):
+            response = get_conditional_response(
+                request, etag=response.get('ETag'),
+                last_modified=validators[1], response=response)
+        # After caching, so that a HEAD request caches the body for GET
+        return _strip_body(request, response)
+
+    if asyncio.iscoroutinefunction(http_handler):
+
+        @wraps(http_handler)
+        async def async_wrapper(*args, **kwargs):
+            request, accept_headers, validators, response = await aprepare(
+                args, kwargs)
+            if response is not None:
+                return response
+            timer = begin(request)
+
+            async def respond():
+                started = perf_counter()
+                output = await http_handler(*args, **kwargs)
+                content = output
+                if isinstance(output, tuple) and len(output) == 2:
+                    content = output[0]
+                if isinstance(content, Representation):
+                    # Produce the deferred embedded objects concurrently
+                    await content.aresolve()
+                if timer is not None:
+                    timer.add('view', started)
+                return render(request, output, accept_headers, validators,
+                              timer)
+
+            try:
+                if use_cache(request):
+                    response = await cache.aget_response(
+                        request, cache_variant(request, accept_headers),
+                        respond)
+                else:
+                    response = await respond()
+                response = conclude(request, response, validators)
+                return response
+            finally:
+                if timer is not None:
+                    end(async_wrapper, request, timer, response)
+
+        return async_wrapper
+
+    @wraps(http_handler)
+    def wrapper(*args, **kwargs):
+        request, accept_headers, validators, response = prepare(args, kwargs)
+        if response is not None:
+            return response
+        timer = begin(request)
+
+        def respond():
+            started = perf_counter()
+            output = http_handler(*args, **kwargs)
+            if timer is not None:
+                timer.add('view', started)
+            return render(request, output, accept_headers, validators, timer)
+
+        try:
+            if use_cache(request):
+                response = cache.get_response(
+                    request, cache_variant(request, accept_headers), respond)
+            else:
+                response = respond()
+            response = conclude(request, response, validators)
+            return response
+        finally:
+            if timer is not None:
+                end(wrapper, request, timer, response)
+
     return wrapper
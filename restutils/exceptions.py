@@ -68,4 +68,22 @@ class NotFound(ApiError):
 
 class Forbidden(ApiError):
     status = 403
-    message = "Access denied"
\ No newline at end of file
+    message = "Access denied"
+
+
+class PayloadTooLarge(ApiError):
+    status = 413
+    message = "Request body too large"
+
+
+class ValidationFailed(BadRequest):
+    """A request body that doesn't match its schema. errors is the list of
+    BadRequests for the individual problems, with the JSON Pointer of the
+    invalid value as their path. They are embedded in the vnd.error
+    document."""
+
+    message = "Invalid request body"
+
+    def __init__(self, errors, message=None, **kwargs):
+        super(ValidationFailed, self).__init__(message, **kwargs)
+        self.errors = errors
@@ -1,7 +1,23 @@
-import json
+import asyncio
+import inspect
+import threading
+import contextvars
 import collections
+import collections.abc
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+try:
+    from asgiref.sync import async_to_sync, sync_to_async
+    has_asgiref = True
+except ImportError:
+    has_asgiref = False
 
 from restutils.lib.uri_tools import full_uri
+from restutils.lib.json_encoding import encode, get_encoder, buffered
 
 # http://www.iana.org/assignments/link-relations/link-relations.xhtml
 default_titles = {
@@ -26,132 +42,520 @@ def contains_template(rel):
 
 
 def _object_data(item):
-    return None if item is None else item.data
+    return None if item is None else item.to_dict()
+
+
+def _links_to_dict(links):
+    return {rel: ([link.to_dict() for link in value]
+                  if type(value) is list else value.to_dict())
+            for rel, value in links.items()}
+
+
+def _embedded_to_dict(value):
+    if type(value) is list:
+        return [_object_data(item) for item in value]
+    return _object_data(value)
+
+
+def _split_names(value):
+    if value is None:
+        return None
+    return frozenset(name.strip() for name in value.split(',') if name.strip())
+
+
+def _fieldsets(request):
+    """Returns the property names of the ?fields= query parameter and the
+    relations of the ?embed= parameter, or None when a parameter is missing.
+    They are parsed once per request."""
+    try:
+        return request._restutils_fieldsets
+    except AttributeError:
+        pass
+    query = getattr(request, 'GET', None)
+    if query is None:
+        return None, None
+    fieldsets = (_split_names(query.get('fields')),
+                 _split_names(query.get('embed')))
+    request._restutils_fieldsets = fieldsets
+    return fieldsets
 
 
 class Link(object):
+    """A HAL link. Links are immutable: the Representation makes a copy with
+    an absolute href when it adds one."""
 
-    def set_value(self, key, value):
-        if value is not None:
-            self.data[key] = value
+    __slots__ = ('href', 'templated', 'media_type', 'name', 'profile',
+                 'title', 'hreflang')
 
     def __init__(self, href=None, templated=None, media_type=None,
                  deprecation=None, name=None, profile=None, title=None,
                  hreflang=None):
         assert href is not None
-        self.data = collections.OrderedDict()
         if contains_template(href):
             templated = True
-        self.set_value('href', href)
-        self.set_value('templated', templated)
-        self.set_value('type', media_type)
-        self.set_value('name', name)
-        self.set_value('profile', profile)
-        self.set_value('title', title)
-        self.set_value('hreflang', hreflang)
+        self._set(href, templated, media_type, name, profile, title, hreflang)
+
+    def _set(self, href, templated, media_type, name, profile, title,
+             hreflang):
+        self.href = href
+        self.templated = templated
+        self.media_type = media_type
+        self.name = name
+        self.profile = profile
+        self.title = title
+        self.hreflang = hreflang
+
+    def _replace(self, href, title):
+        link = Link.__new__(Link)
+        link._set(href, self.templated, self.media_type, self.name,
+                  self.profile, title, self.hreflang)
+        return link
+
+    def to_dict(self):
+        data = {'href': self.href}
+        if self.templated is not None:
+            data['templated'] = self.templated
+        if self.media_type is not None:
+            data['type'] = self.media_type
+        if self.name is not None:
+            data['name'] = self.name
+        if self.profile is not None:
+            data['profile'] = self.profile
+        if self.title is not None:
+            data['title'] = self.title
+        if self.hreflang is not None:
+            data['hreflang'] = self.hreflang
+        return data
+
+    @property
+    def data(self):
+        return self.to_dict()
+
+
+def _href_link(href, title=None):
+    # Plain string links are not checked for templates
+    link = Link.__new__(Link)
+    link.href = href
+    link.templated = link.media_type = link.name = None
+    link.profile = link.hreflang = None
+    link.title = title
+    return link
+
+
+class ObjectStream(object):
+    """An embedded object list that is only consumed when the representation
+    is serialized, so that the objects never have to be in memory all at
+    once."""
+
+    def __init__(self, iterator):
+        self.iterator = iterator
+
+
+class _Deferred(object):
+    """An embedded object (or object list, when many is set) that is only
+    produced when it is serialized. The producer is a callable or an
+    awaitable."""
+
+    __slots__ = ('producer', 'many')
+
+    def __init__(self, producer, many):
+        self.producer = producer
+        self.many = many
+
+
+# Set in the threads that produce deferred objects
+_worker = threading.local()
+
+
+@lru_cache(maxsize=None)
+def _embed_executor(workers):
+    return ThreadPoolExecutor(workers, thread_name_prefix='restutils-embed')
+
+
+def _embed_workers():
+    return getattr(settings, 'RESTUTILS_EMBED_WORKERS', 1)
+
+
+def _in_transaction():
+    return any(connection.in_atomic_block for connection in connections.all())
+
+
+def _use_workers(workers):
+    # Worker threads have database connections of their own, so they would
+    # not see the uncommitted changes of a transaction of the request
+    return workers > 1 and not getattr(_worker, 'active', False) and \
+        not _in_transaction()
+
+
+async def _await(awaitable):
+    return await awaitable
+
+
+def _produce(producer):
+    value = producer() if callable(producer) else producer
+    if inspect.isawaitable(value):
+        if has_asgiref:
+            # Awaited in the event loop of the request, when there is one
+            value = async_to_sync(_await)(value)
+        else:
+            value = asyncio.run(_await(value))
+    return value
+
+
+def _produce_in_worker(producer):
+    _worker.active = True
+    # Like for a request: don't keep connections that are broken or older
+    # than CONN_MAX_AGE around in the worker threads
+    close_old_connections()
+    try:
+        return _produce(producer)
+    finally:
+        close_old_connections()
+
+
+def _produce_all(producers):
+    """Returns the values of the producers, in order. When there is more than
+    one and RESTUTILS_EMBED_WORKERS is larger than 1, they are called
+    concurrently in a pool of that many threads, each in a copy of the context
+    of the caller. By default, and inside transactions, they are called one
+    by one."""
+    workers = _embed_workers()
+    if len(producers) < 2 or not _use_workers(workers):
+        return [_produce(producer) for producer in producers]
+    executor = _embed_executor(workers)
+    futures = [executor.submit(contextvars.copy_context().run,
+                               _produce_in_worker, producer)
+               for producer in producers]
+    return [future.result() for future in futures]
+
+
+async def _aproduce(producer):
+    if inspect.isawaitable(producer):
+        return await producer
+    if asyncio.iscoroutinefunction(producer):
+        return await producer()
+    # Don't block the event loop with synchronous producers (like database
+    # queries)
+    workers = _embed_workers()
+    if _use_workers(workers):
+        return await asyncio.get_running_loop().run_in_executor(
+            _embed_executor(workers), contextvars.copy_context().run,
+            _produce_in_worker, producer)
+    if has_asgiref:
+        # In the thread that runs the synchronous code of the request, like
+        # sync_to_async does for views
+        return await sync_to_async(_produce)(producer)
+    return await asyncio.get_running_loop().run_in_executor(
+        None, contextvars.copy_context().run, _produce, producer)
+
+
+def _deferred(value):
+    return callable(value) or inspect.isawaitable(value)
 
 
 class Representation(object):
+    """A HAL document. Links and embedded objects are kept as Link and
+    Representation objects and are only converted to dictionaries by to_dict()
+    and to_json().
+
+    Property values and embedded objects can also be callables, which are only
+    called when the representation is serialized. Embedded objects can also
+    be awaitables. Deferred embedded objects are added in the order in which
+    they were declared. In coroutine views, json_view awaits aresolve(), which
+    produces them and computes the property values concurrently with
+    asyncio.gather.
+
+    Clients can ask for some of the properties with the ?fields= query
+    parameter and for some of the embedded relations with ?embed= (comma
+    separated names, for the document and all embedded objects). The
+    callables of the other properties and relations are never called."""
+
+    __slots__ = ('request', '_data', '_links', '_embedded', '_curie_names')
 
     curies = collections.OrderedDict()
 
+    # Whether the ?fields= and ?embed= query parameters apply
+    sparse_fieldsets = True
+
     def __init__(self, request):
-        self.data = collections.OrderedDict()
         self.request = request
+        # _data holds the properties and, in order of appearance, the _links
+        # and _embedded dictionaries
+        self._data = {}
+        self._links = None
+        self._embedded = None
+        self._curie_names = set()
+
+    @property
+    def data(self):
+        return self.to_dict()
 
     def has_curie(self, name):
-        links = self.data.get('_links')
-        if not links:
-            return False
-        curies = links.get('curies')
-        if not curies:
-            return False
-        for item in curies:
-            if item['name'] == name:
-                return True
-        return False
+        return name in self._curie_names
+
+    def _add_curie_link(self, link):
+        self._curie_names.add(link.name)
+        self._set_link('curies', [link])
 
     def add_curie(self, name, href):
-        if not self.has_curie(name):
-            self.add_link_list("curies", Link(
+        if name not in self._curie_names:
+            self._add_curie_link(Link(
                 href=full_uri(self.request, href),
                 name=name,
                 title="Compact URI for namespacing"))
 
     def add_curie_for_rel(self, rel):
         name = rel[:rel.index(':')]
+        if name in self._curie_names:
+            return
         href = self.curies.get(name)
         if href:
             self.add_curie(name, href)
 
-    def link_to_hal(self, link_object):
+    def _resolve_link(self, link_object, default_title=None):
         if isinstance(link_object, Link):
-            link_data = link_object.data
-        else:
-            link_data = {'href': link_object}
-        link_data['href'] = full_uri(self.request, link_data['href'])
-        return link_data
+            return link_object._replace(
+                full_uri(self.request, link_object.href),
+                link_object.title or default_title)
+        return _href_link(full_uri(self.request, link_object), default_title)
+
+    def link_to_hal(self, link_object):
+        return self._resolve_link(link_object).to_dict()
+
+    def _get_links(self):
+        if self._links is None:
+            self._links = self._data['_links'] = {}
+        return self._links
 
     def _set_link(self, rel, value):
         if contains_curie(rel):
             self.add_curie_for_rel(rel)
-        self.data['_links'] = self.data.get(
-            '_links', collections.OrderedDict())
-        current_items = self.data['_links'].get(rel)
-        if type(current_items) is list:
-            value += current_items
-        self.data['_links'][rel] = value
+        links = self._get_links()
+        if type(value) is list:
+            current_items = links.get(rel)
+            if type(current_items) is list:
+                current_items.extend(value)
+                return
+        links[rel] = value
 
     def add_link_list(self, rel, link_list):
         if type(link_list) is not list:
             link_list = [link_list]
-        self._set_link(rel, [self.link_to_hal(link) for link in link_list])
+        self._set_link(rel, [self._resolve_link(link) for link in link_list])
 
     def add_link(self, rel, link_object):
-        link_data = self.link_to_hal(link_object)
-        if not link_data.get('title'):
-            default_title = default_titles.get(rel)
-            if default_title:
-                link_data['title'] = default_title
-        self._set_link(rel, link_data)
+        self._set_link(rel, self._resolve_link(link_object,
+                                               default_titles.get(rel)))
 
     def _set_object(self, rel, value):
         if contains_curie(rel):
             self.add_curie_for_rel(rel)
-        self.data['_embedded'] = self.data.get(
-            '_embedded', collections.OrderedDict())
-        self.data['_embedded'][rel] = value
+        if self._embedded is None:
+            self._embedded = self._data['_embedded'] = {}
+        self._embedded[rel] = value
 
     def move_curies_to_top(self, embedded_object):
-        if embedded_object is None:
+        if embedded_object is None or not embedded_object._curie_names:
             return
-        if(embedded_object.data.get('_links') and
-           embedded_object.data['_links'].get('curies')):
-            curies = embedded_object.data['_links']['curies']
-            del(embedded_object.data['_links']['curies'])
-            # remove _links if it is empty after removing the curie link
-            if len(embedded_object.data['_links']) == 0:
-                del(embedded_object.data['_links'])
-            for curie in curies:
-                if not self.has_curie(curie['name']):
-                    self.add_curie(curie['name'], curie['href'])
+        links = embedded_object._links
+        curies = links.pop('curies')
+        embedded_object._curie_names = set()
+        # remove _links if it is empty after removing the curie link
+        if not links:
+            del embedded_object._data['_links']
+            embedded_object._links = None
+        for curie in curies:
+            if curie.name not in self._curie_names:
+                self._add_curie_link(curie)
 
     def add_object_list(self, rel, object_list):
+        if _deferred(object_list):
+            self._set_object(rel, _Deferred(object_list, True))
+            return
+        if isinstance(object_list, collections.abc.Iterator):
+            self._set_object(rel, ObjectStream(object_list))
+            return
         if type(object_list) is not list:
             object_list = [object_list]
         for value in object_list:
             self.move_curies_to_top(value)
-        self._set_object(rel, [_object_data(item) for item in object_list])
+        self._set_object(rel, list(object_list))
 
     def add_object(self, rel, value):
+        if _deferred(value):
+            self._set_object(rel, _Deferred(value, False))
+            return
         self.move_curies_to_top(value)
-        self._set_object(rel, _object_data(value))
+        self._set_object(rel, value)
 
     def add_property(self, name, value):
-        self.data[name] = value
+        self._data[name] = value
+
+    def _streams(self):
+        if not self._embedded:
+            return []
+        return [rel for rel, value in self._embedded.items()
+                if isinstance(value, ObjectStream)]
+
+    def is_streaming(self):
+        return len(self._streams()) > 0
+
+    def count_embedded(self):
+        """Returns the number of embedded objects, not counting the objects of
+        streams and callables that have not been consumed yet."""
+        count = 0
+        for value in (self._embedded or {}).values():
+            if isinstance(value, list):
+                count += len(value)
+            elif not isinstance(value, (ObjectStream, _Deferred)):
+                count += 1
+        return count
+
+    def _fieldsets(self):
+        if not self.sparse_fieldsets:
+            return None, None
+        return _fieldsets(self.request)
+
+    def _set_produced(self, rel, deferred, value):
+        # In the order of declaration, so that the curies are hoisted in a
+        # deterministic order
+        if deferred.many:
+            self.add_object_list(rel, value)
+        else:
+            self.add_object(rel, value)
+
+    def _requested_deferred(self):
+        if not self._embedded:
+            return []
+        embed = self._fieldsets()[1]
+        return [(rel, value) for rel, value in self._embedded.items()
+                if isinstance(value, _Deferred) and
+                (embed is None or rel in embed)]
+
+    def _requested_embedded(self):
+        """Returns the embedded relations that were asked for, and their
+        values. Deferred values are produced."""
+        if not self._embedded:
+            return []
+        deferred = self._requested_deferred()
+        if deferred:
+            values = _produce_all([value.producer for _, value in deferred])
+            for (rel, value), produced in zip(deferred, values):
+                self._set_produced(rel, value, produced)
+        embed = self._fieldsets()[1]
+        return [(rel, value) for rel, value in self._embedded.items()
+                if embed is None or rel in embed]
+
+    def _requested_callables(self):
+        fields = self._fieldsets()[0]
+        return [(key, value) for key, value in self._data.items()
+                if callable(value) and (fields is None or key in fields)]
+
+    def _is_resolved(self):
+        return not self._embedded and not any(
+            callable(value) for value in self._data.values())
+
+    async def aresolve(self):
+        """Produces the deferred embedded objects and computes the callable
+        property values that were asked for, of this representation and of
+        its embedded representations, with asyncio.gather. Synchronous
+        callables (like database queries) don't run in the event loop."""
+        deferred = self._requested_deferred()
+        properties = self._requested_callables()
+        if deferred or properties:
+            values = await asyncio.gather(
+                *[_aproduce(value.producer) for _, value in deferred],
+                *[_aproduce(value) for _, value in properties])
+            for (rel, value), produced in zip(deferred, values):
+                self._set_produced(rel, value, produced)
+            for (key, _), produced in zip(properties, values[len(deferred):]):
+                self._data[key] = produced
+        embedded = []
+        for rel, value in self._requested_embedded():
+            for item in (value if type(value) is list else [value]):
+                if (isinstance(item, Representation) and
+                        not item._is_resolved()):
+                    embedded.append(item.aresolve())
+        if embedded:
+            await asyncio.gather(*embedded)
+
+    def _property_value(self, key, value):
+        if callable(value):
+            # Remember the value, so that it is only computed once
+            value = self._data[key] = _produce(value)
+        return value
+
+    def _consume_stream(self, stream):
+        for item in stream.iterator:
+            self.move_curies_to_top(item)
+            yield item
+
+    def _iter_chunks(self, dumps):
+        # The _links are written last, because the curies of the streamed
+        # objects are only known after all of them have been consumed
+        fields = self._fieldsets()[0]
+        separator = b'{'
+        for key, value in self._data.items():
+            if key in ('_links', '_embedded'):
+                continue
+            if fields is not None and key not in fields:
+                continue
+            value = self._property_value(key, value)
+            yield separator + dumps(key) + b':' + dumps(value)
+            separator = b','
+        embedded = self._requested_embedded()
+        if embedded:
+            yield separator + b'"_embedded":'
+            separator = b'{'
+            for rel, value in embedded:
+                yield separator + dumps(rel) + b':'
+                separator = b','
+                if not isinstance(value, ObjectStream):
+                    yield dumps(_embedded_to_dict(value))
+                    continue
+                item_separator = b'['
+                for item in self._consume_stream(value):
+                    yield item_separator + dumps(_object_data(item))
+                    item_separator = b','
+                yield b'[]' if item_separator == b'[' else b']'
+            yield b'}'
+            separator = b','
+        if self._links:
+            yield separator + b'"_links":' + dumps(_links_to_dict(self._links))
+        elif separator == b'{':
+            yield separator
+        yield b'}'
+
+    def iter_json(self, encoder=None):
+        """Returns the json representation as an iterator of byte strings.
+        Embedded object lists that were added as iterators are encoded one
+        object at a time."""
+        return buffered(self._iter_chunks(get_encoder(encoder)))
+
+    def _materialize(self):
+        for rel, value in self._requested_embedded():
+            if isinstance(value, ObjectStream):
+                self._embedded[rel] = list(self._consume_stream(value))
 
-    def to_json(self):
-        return json.dumps(self.data, indent=4, ensure_ascii=False)
+    def to_json(self, pretty=False, encoder=None):
+        return encode(self.to_dict(), pretty=pretty, encoder=encoder)
 
     def to_dict(self):
-        return self.data
+        fields, embed = self._fieldsets()
+        self._materialize()
+        data = {}
+        for key, value in self._data.items():
+            if key == '_links':
+                value = _links_to_dict(value)
+            elif key == '_embedded':
+                value = {rel: _embedded_to_dict(item)
+                         for rel, item in value.items()
+                         if embed is None or rel in embed}
+                if not value:
+                    continue
+            elif fields is not None and key not in fields:
+                continue
+            else:
+                value = self._property_value(key, value)
+            data[key] = value
+        return data
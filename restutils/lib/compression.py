@@ -0,0 +1,102 @@
+"""Gzip compression of json_view and vnd.error responses, for clients that send
+"gzip" in their Accept-Encoding header.
+
+Compression is enabled for all responses with the RESTUTILS_COMPRESSION setting
+or per view with json_view(compress=...). RESTUTILS_COMPRESSION_LEVEL sets the
+zlib compression level (1-9, default 6) and RESTUTILS_COMPRESSION_MIN_SIZE the
+size in bytes below which a body is not worth compressing (default 200).
+Streamed responses are compressed chunk by chunk."""
+
+import zlib
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+
+def compression_level(compress=None):
+    """Returns the zlib compression level for the compress option of a view
+    (None to use the settings, a boolean or a level), or None when the
+    response should not be compressed."""
+    if compress is None:
+        compress = getattr(settings, 'RESTUTILS_COMPRESSION', False)
+    if compress is False:
+        return None
+    if compress is True:
+        return getattr(settings, 'RESTUTILS_COMPRESSION_LEVEL', 6)
+    return compress
+
+
+def _quality(params):
+    name, _, value = params.partition('=')
+    if name.strip() != 'q':
+        return 1.0
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+@lru_cache(maxsize=64)
+def _accepts_gzip(accept_encoding):
+    qualities = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        qualities[coding.strip().lower()] = _quality(params)
+    # An explicit gzip entry overrides the * wildcard, wherever it is
+    quality = qualities.get('gzip', qualities.get('*', 0.0))
+    return quality > 0
+
+
+def accepts_gzip(request):
+    return _accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+
+
+def _compressor(level):
+    # wbits 16 + MAX_WBITS writes a gzip header without a timestamp, so the
+    # same content always compresses to the same bytes
+    return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def compress_bytes(data, level):
+    compressor = _compressor(level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_chunks(chunks, level):
+    compressor = _compressor(level)
+    for chunk in chunks:
+        # Flush every chunk, so that the client gets it without delay
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def compress_response(request, response, level):
+    """Compresses the response body in place when the client accepts gzip."""
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if response.has_header('Content-Encoding') or not accepts_gzip(request):
+        return response
+
+    if response.streaming:
+        response.streaming_content = compress_chunks(
+            response.streaming_content, level)
+        if response.has_header('Content-Length'):
+            del response['Content-Length']
+    else:
+        content = response.content
+        if len(content) < getattr(settings, 'RESTUTILS_COMPRESSION_MIN_SIZE',
+                                  200):
+            return response
+        compressed = compress_bytes(content, level)
+        if len(compressed) >= len(content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+
+    # The compressed body is another byte sequence than the one that was
+    # hashed, so a strong ETag would be wrong
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+    response['Content-Encoding'] = 'gzip'
+    return response
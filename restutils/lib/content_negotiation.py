@@ -1,4 +1,7 @@
-from collections import OrderedDict
+from functools import lru_cache
+from collections import OrderedDict, namedtuple
+
+from restutils.lib.msgpack_encoding import has_msgpack
 
 
 fallback_list = OrderedDict([
@@ -9,6 +12,27 @@ fallback_list = OrderedDict([
     ('default', 'application/json; charset=utf-8'),
 ])
 
+# The media type to try when the client does not accept a media type
+fallbacks = {
+    'vnd.error': 'hal+json',
+    'hal+json': 'json',
+}
+
+# The binary media type with the same structure as a media type, which is
+# tried after the text media type and its fallbacks. Text never falls back to
+# a binary media type: a client only gets one when it asks for it.
+binary_equivalents = {}
+
+if has_msgpack:
+    fallback_list['hal+msgpack'] = 'application/hal+msgpack'
+    fallback_list['msgpack'] = 'application/msgpack'
+    fallbacks['hal+msgpack'] = 'msgpack'
+    binary_equivalents['vnd.error'] = 'hal+msgpack'
+    binary_equivalents['hal+json'] = 'hal+msgpack'
+    binary_equivalents['json'] = 'msgpack'
+
+MediaRange = namedtuple('MediaRange', ['type', 'subtype', 'quality'])
+
 
 def _parse_part(header_part):
     sub_parts = header_part.split(';')
@@ -28,19 +52,114 @@ def parse(header):
     return [_parse_part(part) for part in header.split(',')]
 
 
+# Bounded, because the media ranges come from the clients
+@lru_cache(maxsize=256)
+def _split_media_type(media_type):
+    value = media_type.split(';', 1)[0].strip().lower()
+    if value == '*':
+        # Some clients send a single asterisk instead of */*
+        return '*', '*'
+    main_type, _, subtype = value.partition('/')
+    return main_type, subtype
+
+
+@lru_cache(maxsize=256)
+def parse_accept(accept_header):
+    """Parses an Accept header into a tuple of MediaRange objects. Media ranges
+    that can't be parsed are skipped."""
+    media_ranges = []
+    for part in parse(accept_header):
+        main_type, subtype = _split_media_type(part['value'])
+        if not main_type or not subtype:
+            continue
+        try:
+            quality = float(part['params'].get('q', 1))
+        except ValueError:
+            continue
+        media_ranges.append(
+            MediaRange(main_type, subtype, min(max(quality, 0.0), 1.0)))
+    return tuple(media_ranges)
+
+
+def _match(media_type, media_ranges):
+    """Returns the (quality, specificity) of the most specific media range that
+    matches the media type, or None when no media range matches."""
+    main_type, subtype = _split_media_type(media_type)
+    best = None
+    for media_range in media_ranges:
+        if media_range.type == '*':
+            specificity = 0
+        elif media_range.type != main_type:
+            continue
+        elif media_range.subtype == '*':
+            specificity = 1
+        elif media_range.subtype == subtype:
+            specificity = 2
+        else:
+            continue
+        if (best is None or specificity > best[1] or
+                (specificity == best[1] and media_range.quality > best[0])):
+            best = (media_range.quality, specificity)
+    return best
+
+
+def fallback_chain(key):
+    chain = []
+    while key is not None and key not in chain:
+        chain.append(key)
+        key = fallbacks.get(key)
+    return chain
+
+
+def _candidates(optimal):
+    """The media types that can be returned for the optimal media type, in
+    order of preference. The binary ones come last, so that clients that
+    accept anything still get JSON."""
+    candidates = fallback_chain(optimal)
+    binary = binary_equivalents.get(optimal)
+    if binary is not None:
+        candidates += [key for key in fallback_chain(binary)
+                       if key not in candidates]
+    return candidates
+
+
+def register_media_type(key, content_type, fallback=None):
+    """Makes a custom media type available for content negotiation. When the
+    client does not accept it, the fallback media type is tried next."""
+    fallback_list[key] = content_type
+    if fallback is None:
+        fallbacks.pop(key, None)
+    else:
+        fallbacks[key] = fallback
+    best_content_type.cache_clear()
+
+
+@lru_cache(maxsize=256)
 def best_content_type(optimal, accept_header):
-    parsed_header = parse(accept_header)
-    # in Python3, keys() and values() are iterable views that cannot be indexed
-    ct_keys = list(fallback_list.keys())
-    try:
-        start_at = ct_keys.index(optimal)
-    except ValueError:
+    """Returns the content type for the optimal media type or one of its
+    fallbacks, whichever the client accepts with the highest quality value.
+    When they are accepted equally, the most specific media range wins and
+    then the optimal media type. A media type that is only accepted through a
+    wildcard (like */*) loses to plain json. Results are cached, because real
+    traffic only has a handful of distinct Accept headers."""
+    if optimal not in fallback_list:
         return fallback_list['default']
-    for ix, key in enumerate(ct_keys):
-        if ix < start_at:
+    media_ranges = parse_accept(accept_header)
+    best_key = None
+    best_rank = None
+    for key in _candidates(optimal):
+        rank = _match(fallback_list[key], media_ranges)
+        if rank is None or rank[0] <= 0:
             continue
-        for accept in parsed_header:
-            if key in accept['value']:
-                return fallback_list[key]
-    # Nothing found - default to json
-    return fallback_list['default']
+        if best_rank is None or rank > best_rank:
+            best_key, best_rank = key, rank
+    if best_key is None:
+        # Nothing found - default to json
+        return fallback_list['default']
+    if best_rank[1] < 2:
+        # Only accepted through a wildcard, like */* of browsers: plain json,
+        # unless the client likes that less
+        default_rank = _match(fallback_list['default'], media_ranges)
+        if default_rank is not None and default_rank[0] >= best_rank[0]:
+            return fallback_list['default']
+    return fallback_list[best_key]
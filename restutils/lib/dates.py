@@ -0,0 +1,50 @@
+"""Fast ISO 8601 formatting of datetimes.
+
+The output is the same as that of isodate.datetime_isoformat: seconds
+precision and the UTC offset, like 2020-01-02T03:04:05+01:00, or a Z for UTC
+(except for datetime.timezone.utc, which isodate writes as +00:00).
+Naive datetimes are made aware in the current timezone (settings.TIME_ZONE,
+unless another timezone was activated) with django's make_aware."""
+
+import datetime
+
+from django.utils.timezone import get_current_timezone, is_naive, make_aware
+
+_zero = datetime.timedelta(0)
+
+
+def format_datetime(date, timezone=None):
+    """Returns the datetime (or date) as an ISO 8601 string. Pass the timezone
+    of naive datetimes to save looking it up."""
+    if type(date) is datetime.date:
+        return date.isoformat()
+    if is_naive(date):
+        date = make_aware(date, timezone or get_current_timezone())
+    text = date.isoformat(timespec='seconds')
+    # Like isodate, which only writes a Z for timezones without daylight
+    # saving time, so not for datetime.timezone.utc
+    if text.endswith('+00:00') and date.dst() == _zero:
+        return text[:-6] + 'Z'
+    return text
+
+
+def iso_date(date):
+    if date is not None:
+        return format_datetime(date)
+
+
+def iso_dates(dates):
+    """Like iso_date, for every datetime of an iterable. Returns a list. The
+    timezone is only looked up once."""
+    timezone = get_current_timezone()
+    return [None if date is None else format_datetime(date, timezone)
+            for date in dates]
+
+
+def iso_default(value):
+    """A default function for JSON encoders, that formats datetimes and dates
+    with iso_date."""
+    if isinstance(value, datetime.date):
+        return format_datetime(value)
+    raise TypeError("Type is not JSON serializable: %s" %
+                    type(value).__name__)
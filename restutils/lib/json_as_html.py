@@ -1,8 +1,29 @@
+"""The html browser view of json responses: the pretty printed json, color coded
+by highlight.js, with URL values as clickable links.
+
+The page is rendered from the data in one walk over the structure, so the time
+is linear in the size of the document. Everything is html escaped, and only
+string values that are http(s) URLs as a whole are turned into links.
+
+Rendering a huge collection for a browser is a waste of a worker, so
+render_html stops when the page grows larger than max_size characters (the
+RESTUTILS_HTML_MAX_SIZE setting, 1 MiB by default; None for no limit). The
+caller then returns plain json instead."""
+
 import re
+import json
+from html import escape
+from collections.abc import Iterator
 
+from django.conf import settings
 
-def create_html(json_string):
-    content = """
+from restutils.lib.json_encoding import decode
+
+_url = re.compile(r'https?://[^\s"\'<>\\]+')
+
+_indent = ' ' * 4
+
+_header = """
     <html>
     <head>
     <title>JSON output</title>
@@ -11,9 +32,85 @@ def create_html(json_string):
     <body>
     <script src="//cdnjs.cloudflare.com/ajax/libs/highlight.js/8.4/highlight.min.js"></script>
     <script>hljs.initHighlightingOnLoad();</script>
-    <pre><code class="json">""" + re.sub('"(https?://.*)"', '"<a href="\\1">\\1</a>"', json_string) + """
+    <pre><code class="json">"""
+
+_footer = """
     </code>
     </pre>
     </body>
     </html>"""
-    return content
\ No newline at end of file
+
+
+def html_max_size():
+    return getattr(settings, 'RESTUTILS_HTML_MAX_SIZE', 1024 * 1024)
+
+
+def _string(value):
+    text = escape(json.dumps(value, ensure_ascii=False), quote=False)
+    if _url.fullmatch(value):
+        return '"<a href="%s">%s</a>"' % (escape(value), text[1:-1])
+    return text
+
+
+def _key(key):
+    if not isinstance(key, str):
+        # Like json.dumps, which turns 1, True and None into "1", "true" and
+        # "null"
+        key = json.dumps(key)
+    return escape(json.dumps(key, ensure_ascii=False), quote=False)
+
+
+def _iter_value(value, level):
+    if isinstance(value, str):
+        yield _string(value)
+    elif isinstance(value, dict):
+        if not value:
+            yield '{}'
+            return
+        inner = '\n' + _indent * (level + 1)
+        separator = '{' + inner
+        for key, item in value.items():
+            yield separator + _key(key) + ': '
+            yield from _iter_value(item, level + 1)
+            separator = ',' + inner
+        yield '\n' + _indent * level + '}'
+    elif isinstance(value, (list, tuple, Iterator)):
+        inner = '\n' + _indent * (level + 1)
+        separator = '[' + inner
+        for item in value:
+            yield separator
+            yield from _iter_value(item, level + 1)
+            separator = ',' + inner
+        if separator[0] == '[':
+            yield '[]'
+        else:
+            yield '\n' + _indent * level + ']'
+    else:
+        yield escape(json.dumps(value), quote=False)
+
+
+def iter_html(data):
+    """Yields the html page for the data in chunks, without a size limit."""
+    yield _header
+    yield from _iter_value(data, 0)
+    yield _footer
+
+
+def render_html(data, max_size=None):
+    """Returns the html page for the data, or None when it would be larger
+    than max_size characters. The data is only walked up to that point."""
+    if max_size is None:
+        max_size = html_max_size()
+    chunks = []
+    size = 0
+    for chunk in iter_html(data):
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            return None
+        chunks.append(chunk)
+    return ''.join(chunks)
+
+
+def create_html(json_string):
+    """Returns the html page for a json string, without a size limit."""
+    return ''.join(iter_html(decode(json_string.encode('utf-8'))))
@@ -0,0 +1,182 @@
+"""Pluggable JSON encoders and decoders. Every encoder takes a JSON serializable
+object and returns UTF-8 encoded bytes that can be passed to a HttpResponse as
+is. Every decoder parses bytes directly, without decoding them to a string
+first.
+
+The fastest installed backend is used by default (orjson, then ujson, then the
+standard library json module). You can select a specific backend with the
+RESTUTILS_JSON_ENCODER setting or with the encoder argument of the functions in
+this module. Besides the backend names, a callable that returns bytes is also
+accepted as encoder.
+
+The decoder backend is selected in the same way, with the
+RESTUTILS_JSON_DECODER setting.
+
+With the RESTUTILS_JSON_ISO_DATES setting, the encoders format datetimes and
+dates while serializing, in the format of restutils.utils.iso_date, so that
+they don't have to be formatted in a separate pass over the data.
+
+Compact output is generated by default. Pretty printed output is only meant for
+the html browser view and always uses the standard library json module."""
+
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+
+from restutils.lib.dates import iso_default
+
+try:
+    import orjson
+    has_orjson = True
+except ImportError:
+    has_orjson = False
+
+try:
+    import ujson
+    has_ujson = True
+except ImportError:
+    has_ujson = False
+
+
+def _json_dumps(data):
+    return json.dumps(data, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def _ujson_dumps(data):
+    return ujson.dumps(data, ensure_ascii=False,
+                       escape_forward_slashes=False).encode('utf-8')
+
+
+def _orjson_dumps(data):
+    try:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        # orjson is stricter than json (e.g. integers larger than 64 bits), so
+        # let the standard library have a go before giving up
+        return _json_dumps(data)
+
+
+def _json_dumps_dates(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'),
+                      default=iso_default).encode('utf-8')
+
+
+def _ujson_dumps_dates(data):
+    return ujson.dumps(data, ensure_ascii=False, escape_forward_slashes=False,
+                       default=iso_default).encode('utf-8')
+
+
+def _orjson_dumps_dates(data):
+    try:
+        return orjson.dumps(data, default=iso_default,
+                            option=orjson.OPT_NON_STR_KEYS |
+                            orjson.OPT_PASSTHROUGH_DATETIME)
+    except TypeError:
+        return _json_dumps_dates(data)
+
+
+def pretty_dumps(data):
+    default = None
+    if getattr(settings, 'RESTUTILS_JSON_ISO_DATES', False):
+        default = iso_default
+    return json.dumps(data, indent=4, ensure_ascii=False,
+                      default=default).encode('utf-8')
+
+
+encoders = OrderedDict()
+if has_orjson:
+    encoders['orjson'] = _orjson_dumps
+if has_ujson:
+    encoders['ujson'] = _ujson_dumps
+encoders['json'] = _json_dumps
+
+# The same backends, formatting datetimes with iso_date
+date_encoders = OrderedDict()
+if has_orjson:
+    date_encoders['orjson'] = _orjson_dumps_dates
+if has_ujson:
+    date_encoders['ujson'] = _ujson_dumps_dates
+date_encoders['json'] = _json_dumps_dates
+
+
+def get_encoder(encoder=None):
+    if encoder is None:
+        encoder = getattr(settings, 'RESTUTILS_JSON_ENCODER', None)
+    if callable(encoder):
+        return encoder
+    backends = encoders
+    if getattr(settings, 'RESTUTILS_JSON_ISO_DATES', False):
+        backends = date_encoders
+    if encoder is None:
+        return next(iter(backends.values()))
+    try:
+        return backends[encoder]
+    except KeyError:
+        raise ValueError("Unknown or unavailable JSON encoder: " + encoder)
+
+
+def encode(data, pretty=False, encoder=None):
+    if pretty:
+        return pretty_dumps(data)
+    return get_encoder(encoder)(data)
+
+
+decoders = OrderedDict()
+if has_orjson:
+    decoders['orjson'] = orjson.loads
+if has_ujson:
+    decoders['ujson'] = ujson.loads
+decoders['json'] = json.loads
+
+
+def get_decoder(decoder=None):
+    if decoder is None:
+        decoder = getattr(settings, 'RESTUTILS_JSON_DECODER', None)
+    if decoder is None:
+        return next(iter(decoders.values()))
+    if callable(decoder):
+        return decoder
+    try:
+        return decoders[decoder]
+    except KeyError:
+        raise ValueError("Unknown or unavailable JSON decoder: " + decoder)
+
+
+def decode(data, decoder=None):
+    """Parses JSON from bytes. Raises a ValueError when that fails."""
+    return get_decoder(decoder)(data)
+
+
+# Streamed output is sent in chunks of about this many bytes
+chunk_size = 64 * 1024
+
+
+def buffered(chunks, size=None):
+    """Joins small byte strings into chunks of about chunk_size bytes, so that
+    a streaming response does not send a separate chunk for each item."""
+    size = size or chunk_size
+    buffer = []
+    buffered_size = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered_size += len(chunk)
+        if buffered_size >= size:
+            yield b''.join(buffer)
+            buffer = []
+            buffered_size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def iter_encode_list(iterable, encoder=None):
+    """Encodes the items of an iterable one by one as a JSON array."""
+    dumps = get_encoder(encoder)
+    yield b'['
+    separator = b''
+    for item in iterable:
+        yield separator
+        yield dumps(item)
+        separator = b','
+    yield b']'
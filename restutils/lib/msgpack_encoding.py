@@ -0,0 +1,67 @@
+"""Binary MessagePack (https://msgpack.org) representations, for clients that
+don't need human readable output, like internal services. The documents have
+the same (HAL) structure as the JSON representations, but are smaller and
+faster to encode and decode.
+
+When the msgpack package is installed, the application/hal+msgpack and
+application/msgpack media types take part in the content negotiation of
+json_view and VndErrorMiddleware, and request bodies with these content types
+are parsed by RequestDataMiddleware. With the RESTUTILS_JSON_ISO_DATES setting,
+datetimes and dates are formatted like in the JSON encoders."""
+
+import uuid
+import datetime
+import decimal
+from functools import lru_cache
+
+from django.conf import settings
+
+from restutils.lib.dates import format_datetime
+
+try:
+    import msgpack
+    has_msgpack = True
+except ImportError:
+    has_msgpack = False
+
+media_types = frozenset([
+    'application/hal+msgpack',
+    'application/msgpack',
+    'application/x-msgpack',
+])
+
+
+@lru_cache(maxsize=64)
+def is_msgpack(content_type):
+    return content_type.split(';', 1)[0].strip().lower() in media_types
+
+
+def _default(value):
+    # The types that orjson encodes natively, so that a view gives the same
+    # data in both formats
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError("Cannot serialize %r" % (value,))
+
+
+def _iso_default(value):
+    # The same format as restutils.lib.dates.iso_default of the JSON encoders
+    if isinstance(value, datetime.date):
+        return format_datetime(value)
+    return _default(value)
+
+
+def dumps(data):
+    if getattr(settings, 'RESTUTILS_JSON_ISO_DATES', False):
+        return msgpack.packb(data, use_bin_type=True, default=_iso_default)
+    return msgpack.packb(data, use_bin_type=True, default=_default)
+
+
+def loads(data):
+    """Parses MessagePack from bytes. Raises a ValueError when that fails."""
+    try:
+        return msgpack.unpackb(data, raw=False)
+    except (ValueError, TypeError, msgpack.UnpackException) as error:
+        raise ValueError(str(error))
@@ -0,0 +1,208 @@
+"""Server side caching of complete json_view responses. The serialized body and
+the headers are stored, so a cache hit skips the view, the representation
+building, the content negotiation and the serialization.
+
+Responses are cached per path, query string and negotiated content type. All
+cached responses of a route can be invalidated with invalidate_route(), for
+example from a post_save signal handler.
+
+When several requests miss the cache for the same key at the same time, only
+one of them runs the view. The others wait for its response ("single-flight").
+This works within a process (and within its event loop for coroutine views);
+different processes can still each run the view once."""
+
+import time
+import asyncio
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.http import HttpResponse
+
+try:
+    from asgiref.sync import sync_to_async
+    has_asgiref = True
+except ImportError:
+    has_asgiref = False
+
+# The cache backends of all ResponseCache objects, to invalidate routes in
+_response_caches = weakref.WeakSet()
+
+
+class LocalCache(object):
+    """A thread-safe in-process LRU cache with expiring entries. It implements
+    the get, set and delete methods of django cache backends."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class _Flight(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+
+
+class _AsyncFlight(object):
+
+    def __init__(self):
+        self.done = asyncio.Event()
+        self.entry = None
+
+
+def _hash(*parts):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ResponseCache(object):
+    """Caches json_view responses for timeout seconds. The backend can be the
+    alias of a django cache, a django cache object or None for a LocalCache.
+    Only successful, non-streaming responses to GET and HEAD requests are
+    cached."""
+
+    def __init__(self, timeout=60, backend=None, key_prefix='restutils'):
+        self.timeout = timeout
+        if backend is None:
+            backend = LocalCache()
+        elif isinstance(backend, str):
+            backend = caches[backend]
+        self.backend = backend
+        self.key_prefix = key_prefix
+        self._flights = {}
+        self._async_flights = {}
+        self._lock = threading.Lock()
+        _response_caches.add(self)
+
+    def _generation_key(self, route_name):
+        return '%s:generation:%s' % (self.key_prefix, _hash(route_name))
+
+    def _key(self, request, variant):
+        match = getattr(request, 'resolver_match', None)
+        route_name = match.view_name if match is not None else ''
+        generation = self.backend.get(self._generation_key(route_name), 0)
+        return '%s:response:%s' % (self.key_prefix, _hash(
+            route_name, str(generation), variant, request.get_full_path()))
+
+    def invalidate(self, route_name):
+        # Responses are stored under the generation of their route, so moving
+        # to the next generation makes all of them unreachable
+        key = self._generation_key(route_name)
+        self.backend.set(key, self.backend.get(key, 0) + 1, None)
+
+    def _store(self, key, response):
+        if response.streaming or response.status_code != 200:
+            return None
+        entry = (response.status_code, response.content,
+                 list(response.items()))
+        self.backend.set(key, entry, self.timeout)
+        return entry
+
+    def get_response(self, request, variant, render):
+        """Returns the cached response for the request, or calls render to
+        create and cache it."""
+        key = self._key(request, variant)
+        entry = self.backend.get(key)
+        if entry is not None:
+            return _restore(entry)
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.entry is not None:
+                return _restore(flight.entry)
+            # The response could not be cached, so render our own
+            return render()
+
+        try:
+            response = render()
+            flight.entry = self._store(key, response)
+            return response
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def _acall(self, func, *args):
+        # Django cache backends do blocking I/O, so they are called in a
+        # thread. The LocalCache only takes a lock.
+        if has_asgiref and not isinstance(self.backend, LocalCache):
+            return await sync_to_async(func)(*args)
+        return func(*args)
+
+    async def aget_response(self, request, variant, render):
+        """Like get_response, for coroutine views: render is a coroutine
+        function. Waiting requests and the cache backend don't block the
+        event loop."""
+        key = await self._acall(self._key, request, variant)
+        entry = await self._acall(self.backend.get, key)
+        if entry is not None:
+            return _restore(entry)
+
+        flight = self._async_flights.get(key)
+        if flight is not None:
+            await flight.done.wait()
+            if flight.entry is not None:
+                return _restore(flight.entry)
+            return await render()
+
+        flight = self._async_flights[key] = _AsyncFlight()
+        try:
+            response = await render()
+            flight.entry = await self._acall(self._store, key, response)
+            return response
+        finally:
+            del self._async_flights[key]
+            flight.done.set()
+
+
+def _restore(entry):
+    status, content, headers = entry
+    response = HttpResponse(content=content, status=status)
+    for header, value in headers:
+        response[header] = value
+    return response
+
+
+def invalidate_route(route_name):
+    """Removes the cached responses of the route (use the namespaced name for
+    routes in a namespace) from all response caches."""
+    for response_cache in list(_response_caches):
+        response_cache.invalidate(route_name)
@@ -0,0 +1,85 @@
+"""Opt-in timing of the phases of a request: the route dispatch, the view, the
+content negotiation, the encoding, the html rendering and the compression.
+
+Timing is enabled with the RESTUTILS_TIMING setting. The durations are sent to
+the client in a Server-Timing header (shown by the network panel of browsers),
+together with the size of the response body and the number of embedded
+objects. To aggregate them (in statsd, Prometheus, ...) connect a receiver to
+the request_timed signal:
+
+    def record(sender, request, response, timings, metrics, **kwargs):
+        for phase, duration in timings.items():
+            statsd.timing('api.' + phase, duration)
+
+    request_timed.connect(record)
+
+timings maps the phases to durations in milliseconds; metrics holds the other
+numbers. When timing is disabled, every instrumented function only pays for a
+settings lookup."""
+
+from time import perf_counter
+from collections import OrderedDict
+
+from django.conf import settings
+from django.dispatch import Signal
+
+# Sent when a timed request has been handled, with the request, the response,
+# the timings and the metrics as arguments
+request_timed = Signal()
+
+
+class Timer(object):
+    """Collects the durations of the phases of one request. Phases that run
+    more than once add up."""
+
+    __slots__ = ('timings', 'metrics', 'depth')
+
+    def __init__(self):
+        self.timings = OrderedDict()
+        self.metrics = OrderedDict()
+        # The number of instrumented functions that are using the timer. The
+        # outermost one reports the timings.
+        self.depth = 0
+
+    def add(self, phase, started):
+        """Adds the time since started (a perf_counter value) to the phase."""
+        duration = (perf_counter() - started) * 1000
+        self.timings[phase] = self.timings.get(phase, 0) + duration
+
+    def header(self):
+        parts = ['%s;dur=%.3f' % item for item in self.timings.items()]
+        parts.extend('%s;desc="%s"' % item for item in self.metrics.items())
+        return ', '.join(parts)
+
+    def finish(self, sender, request, response):
+        if not response.streaming:
+            self.metrics.setdefault('size', len(response.content))
+        header = self.header()
+        if response.has_header('Server-Timing'):
+            header = response['Server-Timing'] + ', ' + header
+        response['Server-Timing'] = header
+        request_timed.send(sender=sender, request=request, response=response,
+                           timings=dict(self.timings),
+                           metrics=dict(self.metrics))
+
+
+def begin(request):
+    """Returns the timer of the request, or None when timing is disabled."""
+    if not getattr(settings, 'RESTUTILS_TIMING', False):
+        return None
+    timer = getattr(request, '_restutils_timer', None)
+    if timer is None:
+        timer = request._restutils_timer = Timer()
+    timer.depth += 1
+    return timer
+
+
+def end(sender, request, timer, response):
+    """Stops using the timer. When the outermost user of the timer ends with
+    a response, the timings are added to it and reported. Without a response
+    (when an exception was raised) the timer is left on the request, so that
+    the error response can be timed as well."""
+    timer.depth -= 1
+    if timer.depth == 0 and response is not None:
+        del request._restutils_timer
+        timer.finish(sender, request, response)
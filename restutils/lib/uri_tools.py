@@ -1,4 +1,45 @@
+import re
+
+# Paths that consist of these characters only are left unchanged by
+# request.build_absolute_uri, except for the template braces that it would
+# percent-encode
+_plain_path = re.compile(r"^/(?!/)[A-Za-z0-9\-._~/#%\[\]=:;$&()+,!?*@'{}]*$")
+
+
+class UriBuilder(object):
+    """Builds absolute URIs for a single request. The scheme and host prefix
+    is only determined once, so that absolute paths can be joined to it
+    cheaply. Use uri_builder(request) to get the builder of a request."""
+
+    def __init__(self, request):
+        self.request = request
+        self._prefix = None
+
+    @property
+    def prefix(self):
+        if self._prefix is None:
+            self._prefix = '%s://%s' % (self.request.scheme,
+                                        self.request.get_host())
+        return self._prefix
+
+    def build(self, path):
+        if path is None:
+            return None
+        if _plain_path.match(path) and '/.' not in path:
+            return self.prefix + path
+        # Relative paths, complete URIs and anything that needs to be encoded
+        return self.request.build_absolute_uri(path).replace(
+            '%7B', '{').replace('%7D', '}')
+
+
+def uri_builder(request):
+    try:
+        return request._uri_builder
+    except AttributeError:
+        builder = request._uri_builder = UriBuilder(request)
+        return builder
+
+
 def full_uri(request, path):
     if path is not None:
-        return request.build_absolute_uri(path).replace(
-            '%7B','{').replace('%7D','}')
\ No newline at end of file
+        return uri_builder(request).build(path)
@@ -1,21 +1,86 @@
-from django.core.urlresolvers import get_resolver
-from django.core.urlresolvers import reverse as django_reverse
-from django.core.urlresolvers import resolve
+from functools import lru_cache
+
+from django.core.signals import setting_changed
+from django.urls import get_resolver, get_script_prefix, get_urlconf
+from django.urls import reverse as django_reverse
+from django.urls import resolve, NoReverseMatch
+from django.utils.translation import get_language
 
 from restutils.lib.uri_tools import full_uri
 
 
+@lru_cache(maxsize=None)
+def _route_parameters(resolver):
+    parameters = {}
+    for key, possibilities in resolver.reverse_dict.lists():
+        # Only index route names, not view functions
+        if isinstance(key, str):
+            # like reverse_dict[key], use the last pattern with this name
+            parameters[key] = tuple(possibilities[-1][0][0][1])
+    return parameters
+
+
+def route_parameters():
+    """Returns a dict that maps every route name in the URLconf of the current
+    thread (the request.urlconf of the request that is being handled, or
+    ROOT_URLCONF) to the names of its parameters. It is only computed once per
+    URLconf."""
+    return _route_parameters(get_resolver(get_urlconf()))
+
+
+@lru_cache(maxsize=1024)
+def _reverse(urlconf, language, script_prefix, route_name, kwargs):
+    # The language is part of the key for routes in i18n_patterns
+    return django_reverse(route_name, urlconf=urlconf, kwargs=dict(kwargs))
+
+
+def reverse_path(route_name, kwargs):
+    """Reverses the route like django's reverse, but remembers the result for
+    repeated routes and kwargs, per URLconf, language and script prefix."""
+    try:
+        return _reverse(get_urlconf(), get_language(), get_script_prefix(),
+                        route_name, tuple(sorted(kwargs.items())))
+    except TypeError:
+        # unhashable kwargs can't be cached
+        return django_reverse(route_name, kwargs=kwargs)
+
+
+def _clear_caches(**kwargs):
+    if kwargs['setting'] == 'ROOT_URLCONF':
+        _route_parameters.cache_clear()
+        _reverse.cache_clear()
+
+setting_changed.connect(_clear_caches)
+
+
 class MagicReverser(object):
+    """Reverses routes, filling in the kwargs of the current url. The current
+    url is only resolved when rev is called for the first time."""
 
     def __init__(self, request):
         self.request = request
-        _, self.args, self.kwargs = resolve(request.path)
+        self._kwargs = None
+
+    @property
+    def kwargs(self):
+        if self._kwargs is None:
+            # Django stores the match on the request before the view is called
+            match = getattr(self.request, 'resolver_match', None)
+            if match is None:
+                match = resolve(self.request.path)
+            self._kwargs = match.kwargs
+        return self._kwargs
 
     def rev(self, route_name, **kwargs):
-        self.kwargs.update(kwargs)
-        filter_keys = get_resolver(None).reverse_dict[route_name][0][0][1]
-        filtered_kwargs = {filter_key:self.kwargs.get(filter_key)
-                           for filter_key in filter_keys}
-        return full_uri(
-            self.request,
-            django_reverse(route_name, kwargs=filtered_kwargs))
\ No newline at end of file
+        try:
+            filter_keys = route_parameters()[route_name]
+        except KeyError:
+            raise NoReverseMatch("Unknown route: " + route_name)
+        filtered_kwargs = {}
+        for filter_key in filter_keys:
+            if filter_key in kwargs:
+                filtered_kwargs[filter_key] = kwargs[filter_key]
+            else:
+                filtered_kwargs[filter_key] = self.kwargs.get(filter_key)
+        return full_uri(self.request,
+                        reverse_path(route_name, filtered_kwargs))
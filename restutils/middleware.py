@@ -1,7 +1,11 @@
+from time import perf_counter
+from functools import lru_cache
+
 from django.http import HttpResponse
 from django.conf import settings
-from django.core.signals import got_request_exception
+from django.core.signals import got_request_exception, setting_changed
 from django.core.exceptions import ObjectDoesNotExist
+from django.utils.deprecation import MiddlewareMixin
 
 try:
     from webargs import ValidationError
@@ -11,35 +15,128 @@ except ImportError:
 
 from restutils.hal import Representation
 from restutils.exceptions import ApiError, NotFound, BadRequest
-from restutils.lib.json_as_html import create_html
-from restutils.lib.content_negotiation import best_content_type
+from restutils.lib.json_as_html import render_html
+from restutils.lib.content_negotiation import best_content_type, fallback_list
+from restutils.lib.compression import compression_level, compress_response
+from restutils.lib.timing import begin, end
+from restutils.lib import msgpack_encoding
 from restutils.magicreverse import MagicReverser
 from restutils.utils import decode_json_data
 
 
-def data(self):
-    if not hasattr(self, '_data_dict'):
-        self._data_dict = decode_json_data(self)
-    return self._data_dict
+class _RequestData(object):
+    """The data attribute of requests: the body parsed with decode_json_data.
+    It is parsed when it is first used, and the parsed value is kept on the
+    request. Only requests that RequestDataMiddleware handled have it."""
+
+    def __get__(self, request, owner=None):
+        if request is None:
+            return self
+        values = request.__dict__
+        if '_data_dict' not in values:
+            if not values.get('_restutils_data'):
+                raise AttributeError('data')
+            values['_data_dict'] = decode_json_data(request)
+        return values['_data_dict']
+
+    def __set__(self, request, value):
+        request.__dict__['_data_dict'] = value
+
+
+@lru_cache(maxsize=None)
+def _add_data_attribute(request_class):
+    # Once per class, so that no class is changed while requests use it
+    if not isinstance(getattr(request_class, 'data', None), _RequestData):
+        request_class.data = _RequestData()
+
 
+class RequestDataMiddleware(MiddlewareMixin):
+    """Adds a data attribute to PUT, POST and PATCH requests, with the body
+    parsed by decode_json_data when it is first used."""
 
-class RequestDataMiddleware(object):
+    methods = ('PUT', 'POST', 'PATCH')
 
     def process_request(self, request):
-        if request.method in ('PUT', 'POST'):
-            request.__class__.data = property(data)
+        if request.method in self.methods:
+            _add_data_attribute(type(request))
+            request._restutils_data = True
         return None
 
 
-class MagicReverseMiddleware(object):
+class MagicReverseMiddleware(MiddlewareMixin):
 
     def process_request(self, request):
-        reverser = MagicReverser(request)
-        request.__class__.rev = reverser.rev
+        # The reverser is attached to the request itself, not to its class,
+        # which is shared by concurrent requests
+        request.rev = MagicReverser(request).rev
         return None
 
 
-class VndErrorMiddleware(object):
+class ErrorRepresentation(Representation):
+    """A vnd.error document. Its properties are not filtered by the ?fields=
+    query parameter of the request that failed."""
+
+    __slots__ = ()
+
+    sparse_fieldsets = False
+
+
+def _error_document(request, exception):
+    doc = ErrorRepresentation(request)
+    doc.add_property('message', exception.message)
+    if exception.logref is not None:
+        doc.add_property('logref', exception.logref)
+    if exception.path is not None:
+        doc.add_property('path', exception.path)
+    if exception.about is not None:
+        doc.add_link('about', exception.about)
+    if exception.describes is not None:
+        doc.add_link('describes', exception.describes)
+    if exception.help is not None:
+        doc.add_link('help', exception.help)
+    errors = getattr(exception, 'errors', None)
+    if errors:
+        doc.add_property('total', len(errors))
+        doc.add_object_list('errors', [_error_document(request, error)
+                                       for error in errors])
+    return doc
+
+
+def _is_static(exception):
+    """Whether the error document only holds the default message of the
+    exception class, so that it doesn't depend on the request."""
+    return (exception.logref is None and exception.path is None and
+            exception.about is None and exception.describes is None and
+            exception.help is None and
+            not getattr(exception, 'errors', None) and
+            exception.message == type(exception).message)
+
+
+def _serialize(doc, binary):
+    if binary:
+        return msgpack_encoding.dumps(doc.to_dict())
+    return doc.to_json()
+
+
+@lru_cache(maxsize=None)
+def _static_content(message, binary):
+    # Without links, the document doesn't depend on the request. There is a
+    # default message per exception class, so the cache stays small.
+    return _serialize(_error_document(None, ApiError(message)), binary)
+
+
+def _clear_caches(**kwargs):
+    if kwargs['setting'] == 'RESTUTILS_JSON_ENCODER':
+        _static_content.cache_clear()
+
+setting_changed.connect(_clear_caches)
+
+
+class VndErrorMiddleware(MiddlewareMixin):
+    """Returns vnd.error responses for ApiErrors. The body of errors that
+    only have the default message of their class (like a plain NotFound()) is
+    serialized once and reused. The errors of a ValidationFailed are embedded
+    in its document, as vnd.error documents of their own."""
 
     def process_exception(self, request, exception):
 
@@ -52,21 +149,10 @@ class VndErrorMiddleware(object):
         if not issubclass(type(exception), ApiError):
             return None
 
+        timer = begin(request)
+        started = perf_counter()
         accept_headers = request.META.get('HTTP_ACCEPT', 'application/json')
 
-        doc = Representation(request)
-        doc.add_property('message', exception.message)
-        if exception.logref is not None:
-            doc.add_property('logref', exception.logref)
-        if exception.path is not None:
-            doc.add_property('path', exception.path)
-        if exception.about is not None:
-            doc.add_link('about', exception.about)
-        if exception.describes is not None:
-            doc.add_link('describes', exception.describes)
-        if exception.help is not None:
-            doc.add_link('help', exception.help)
-
         # Make sure the exception signal is fired for Sentry, but don't
         # bother it with anything that's not a server error
         if exception.status >= 500:
@@ -74,13 +160,29 @@ class VndErrorMiddleware(object):
 
         content_type = best_content_type('vnd.error', accept_headers)
 
-        content = doc.to_json()
-
+        content = None
         if 'html' in content_type:
-            content=create_html(content)
+            doc = _error_document(request, exception)
+            content = render_html(doc.to_dict())
+            if content is None:
+                content_type = fallback_list['vnd.error']
+        if content is None:
+            binary = msgpack_encoding.is_msgpack(content_type)
+            if _is_static(exception):
+                content = _static_content(exception.message, binary)
+            else:
+                content = _serialize(_error_document(request, exception),
+                                     binary)
 
         response = HttpResponse(content=content, status=exception.status)
         response['Content-Type'] = content_type
         response['Vary'] = 'Accept'
 
+        level = compression_level()
+        if level is not None:
+            response = compress_response(request, response, level)
+
+        if timer is not None:
+            timer.add('error', started)
+            end(self, request, timer, response)
         return response
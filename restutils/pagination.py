@@ -0,0 +1,201 @@
+"""Keyset (cursor based) pagination of querysets, with HAL first, next,
+previous and last links.
+
+Keyset pagination filters on the ordering fields of the last item of the
+previous page, instead of skipping rows with OFFSET, so deep pages are as fast
+as the first page. The position in the collection is kept in an opaque cursor
+token in the query string of the links.
+
+The fields in the ordering must not be null, and together they must be unique.
+The primary key is appended to the ordering when it isn't in it already. The
+items can also be the rows of QuerySet.values(), when they include the
+ordering fields and the primary key."""
+
+import json
+import base64
+import functools
+import operator
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from restutils.exceptions import BadRequest
+from restutils.serializers import ResourceSchema
+
+
+def _encode_cursor(direction, values):
+    data = json.dumps([direction, values], separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode(
+        'ascii').rstrip('=')
+
+
+# The types of the values in cursors, as json.loads returns them
+_scalar_types = (str, int, float, bool)
+
+
+def _decode_cursor(cursor, size):
+    """Returns the direction and the values (or None) of a cursor with the
+    values of size fields. Raises BadRequest for anything else, because
+    cursors come from the clients."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(
+            cursor + '=' * (-len(cursor) % 4)).decode('utf-8'))
+    except ValueError:
+        raise BadRequest("Invalid cursor")
+    if type(data) is not list or len(data) != 2:
+        raise BadRequest("Invalid cursor")
+    direction, values = data
+    if direction not in ('n', 'p'):
+        raise BadRequest("Invalid cursor")
+    if values is not None and (
+            type(values) is not list or len(values) != size or
+            not all(isinstance(value, _scalar_types) for value in values)):
+        raise BadRequest("Invalid cursor")
+    return direction, values
+
+
+def _field_value(item, name, pk_name):
+    if isinstance(item, dict):
+        if name == 'pk' and 'pk' not in item:
+            # Rows of QuerySet.values() have the primary key under its own
+            # name
+            name = pk_name
+        return item[name]
+    return getattr(item, name)
+
+
+class Page(object):
+    """A page of items, with the cursors of the pages around it. count is only
+    set when the paginator was asked to count the items."""
+
+    def __init__(self, request, cursor_param, items, next_cursor=None,
+                 previous_cursor=None, last_cursor=None, count=None):
+        self.request = request
+        self.cursor_param = cursor_param
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.last_cursor = last_cursor
+        self.count = count
+
+    def link(self, cursor):
+        params = self.request.GET.copy()
+        if cursor is None:
+            params.pop(self.cursor_param, None)
+        else:
+            params[self.cursor_param] = cursor
+        query = params.urlencode()
+        return self.request.path + ('?' + query if query else '')
+
+    def add_links(self, representation):
+        representation.add_link('first', self.link(None))
+        if self.previous_cursor is not None:
+            representation.add_link('previous',
+                                    self.link(self.previous_cursor))
+        if self.next_cursor is not None:
+            representation.add_link('next', self.link(self.next_cursor))
+        if self.last_cursor is not None:
+            representation.add_link('last', self.link(self.last_cursor))
+
+    def add_to(self, representation, rel, item_representation):
+        """Adds the pagination links, the count (when requested) and the items
+        as an embedded object list. item_representation is a function that
+        turns an item into a Representation, or the ResourceSchema of the
+        items."""
+        self.add_links(representation)
+        if self.count is not None:
+            representation.add_property('count', self.count)
+        if isinstance(item_representation, ResourceSchema):
+            item_representation.add_object_list(representation, rel,
+                                                self.items)
+        else:
+            representation.add_object_list(
+                rel, [item_representation(item) for item in self.items])
+
+
+class KeysetPaginator(object):
+    """Paginates a queryset over the ordering fields. Counting the items and
+    the link to the last page need extra queries, so they are only added when
+    with_count and with_last are set."""
+
+    def __init__(self, ordering=('pk',), page_size=25, max_page_size=100,
+                 cursor_param='cursor', page_size_param='page_size',
+                 with_count=False, with_last=False):
+        ordering = list(ordering)
+        if 'pk' not in ordering and '-pk' not in ordering:
+            ordering.append('pk')
+        self.fields = [(field.lstrip('-'), field.startswith('-'))
+                       for field in ordering]
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        self.cursor_param = cursor_param
+        self.page_size_param = page_size_param
+        self.with_count = with_count
+        self.with_last = with_last
+
+    def _ordering(self, forward):
+        return [('-' if descending == forward else '') + name
+                for name, descending in self.fields]
+
+    def _keyset_filter(self, values, forward):
+        """Matches the items after (or before) the item with the values."""
+        conditions = []
+        for ix, (name, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition = {'%s__%s' % (name, lookup): values[ix]}
+            # The fields before this one are equal to those of the item
+            for previous_ix, (previous_name, _) in enumerate(self.fields[:ix]):
+                condition[previous_name] = values[previous_ix]
+            conditions.append(Q(**condition))
+        return functools.reduce(operator.or_, conditions)
+
+    def _key(self, item, pk_name):
+        return [_field_value(item, name, pk_name) for name, _ in self.fields]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.GET[self.page_size_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def paginate(self, request, queryset):
+        page_size = self.get_page_size(request)
+        forward, values = True, None
+        cursor = request.GET.get(self.cursor_param)
+        if cursor:
+            direction, values = _decode_cursor(cursor, len(self.fields))
+            forward = direction == 'n'
+
+        page_queryset = queryset.order_by(*self._ordering(forward))
+        if values is not None:
+            try:
+                page_queryset = page_queryset.filter(
+                    self._keyset_filter(values, forward))
+            except (ValueError, TypeError, ValidationError):
+                # Values that don't fit the fields, like a string for an
+                # integer field
+                raise BadRequest("Invalid cursor")
+        # One extra item tells whether there is a page after this one
+        items = list(page_queryset[:page_size + 1])
+        has_more = len(items) > page_size
+        items = items[:page_size]
+        if not forward:
+            items.reverse()
+
+        if forward:
+            has_next, has_previous = has_more, values is not None
+        else:
+            has_next, has_previous = values is not None, has_more
+
+        next_cursor = previous_cursor = None
+        pk_name = queryset.model._meta.pk.attname
+        if items and has_next:
+            next_cursor = _encode_cursor('n', self._key(items[-1], pk_name))
+        if items and has_previous:
+            previous_cursor = _encode_cursor('p', self._key(items[0], pk_name))
+        # A backward cursor without values starts at the end
+        last_cursor = _encode_cursor('p', None) if self.with_last else None
+        count = queryset.count() if self.with_count else None
+        return Page(request, self.cursor_param, items, next_cursor,
+                    previous_cursor, last_cursor, count)
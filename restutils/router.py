@@ -1,12 +1,28 @@
 import json
+import asyncio
+import contextvars
 import collections
+from time import perf_counter
+from types import MappingProxyType
 
-from django.views.decorators.csrf import csrf_exempt
-from django.conf.urls import url
 from django.http import HttpResponse
 from django.http import HttpResponseNotAllowed
 from django.conf import settings
 
+try:
+    from django.urls import re_path as url
+except ImportError:
+    from django.conf.urls import url
+
+from restutils.lib.timing import begin, end
+from restutils.pagination import KeysetPaginator
+
+try:
+    from asgiref.sync import sync_to_async
+    has_asgiref = True
+except ImportError:
+    has_asgiref = False
+
 
 named_routes = {
     'list': r'^$',
@@ -15,6 +31,14 @@ named_routes = {
     'edit-form': r'^edit/$',
 }
 
+# The request that is being dispatched. Context variables are local to the
+# thread and to the asyncio task, so concurrent requests don't see each other.
+_current_request = contextvars.ContextVar('restutils_request', default=None)
+
+
+def current_request():
+    return _current_request.get()
+
 
 def full_name(prefix, name):
     if not prefix:
@@ -22,27 +46,106 @@ def full_name(prefix, name):
     return prefix + '-' + name
 
 
+class DispatchTable(object):
+    """The immutable mapping of HTTP methods to handlers of a Route, compiled
+    when the url patterns are created. Its view attribute is the view function
+    for the url pattern. Django runs it as a coroutine when any of the
+    handlers is a coroutine function."""
+
+    def __init__(self, handlers):
+        # OPTIONS comes first in the Allow header, but can be overridden
+        table = {'OPTIONS': self.show_options}
+        table.update(handlers)
+        self.handlers = MappingProxyType(table)
+        self.methods = tuple(self.handlers)
+        self.allow = ', '.join(self.methods)
+        self.is_async = any(asyncio.iscoroutinefunction(handler)
+                            for handler in self.handlers.values())
+        self.view = self.async_dispatch if self.is_async else self.dispatch
+
+    def show_options(self, request, *args, **kwargs):
+        response = HttpResponse(b'')
+        response['Allow'] = self.allow
+        return response
+
+    def not_allowed(self):
+        return HttpResponseNotAllowed(self.methods)
+
+    def dispatch(self, request, *args, **kwargs):
+        handler = self.handlers.get(request.method)
+        if handler is None:
+            return self.not_allowed()
+        timer = begin(request)
+        started = perf_counter()
+        token = _current_request.set(request)
+        response = None
+        try:
+            response = handler(request, *args, **kwargs)
+            return response
+        finally:
+            _current_request.reset(token)
+            if timer is not None:
+                timer.add('dispatch', started)
+                end(self, request, timer, response)
+    dispatch.csrf_exempt = True
+
+    async def async_dispatch(self, request, *args, **kwargs):
+        handler = self.handlers.get(request.method)
+        if handler is None:
+            return self.not_allowed()
+        timer = begin(request)
+        started = perf_counter()
+        token = _current_request.set(request)
+        response = None
+        try:
+            if asyncio.iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            elif has_asgiref and handler != self.show_options:
+                # Don't block the event loop with synchronous handlers
+                handler = sync_to_async(handler)
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = handler(request, *args, **kwargs)
+            return response
+        finally:
+            _current_request.reset(token)
+            if timer is not None:
+                timer.add('dispatch', started)
+                end(self, request, timer, response)
+    # csrf_exempt would hide that this is a coroutine function
+    async_dispatch.csrf_exempt = True
+
+
 class Route(object):
 
     def __init__(self):
-        self.handlers = {'OPTIONS': self.show_options}
+        self.handlers = {}
+        self._table = None
 
     def add_handler(self, method, handler):
         self.handlers[method] = handler
+        self._table = None
         if method == 'GET':
             self.add_handler('HEAD', handler)
 
+    def compile(self):
+        if self._table is None:
+            self._table = DispatchTable(self.handlers)
+        return self._table
+
     def show_options(self, request, *args, **kwargs):
-        response = HttpResponse('')
-        response['Allow'] = ', '.join(self.handlers.keys())
-        return response
+        return self.compile().show_options(request, *args, **kwargs)
 
-    @csrf_exempt
     def dispatch(self, request, *args, **kwargs):
-        handler = self.handlers.get(request.method)
-        if handler is None:
-            return HttpResponseNotAllowed(self.handlers.keys())
-        return handler(request, *args, **kwargs)
+        return self.compile().dispatch(request, *args, **kwargs)
+    dispatch.csrf_exempt = True
+
+    def is_async(self):
+        return self.compile().is_async
+
+    @property
+    def view(self):
+        return self.compile().view
 
 
 class RouteSet(object):
@@ -59,36 +162,53 @@ class RouteSet(object):
         url_patterns = []
         for name, route in self.routes.items():
             url_patterns.append(url(named_routes[name],
-                                    route.dispatch,
+                                    route.compile().view,
                                     name=full_name(self.name_prefix, name)))
         return url_patterns
 
 
 class RoutableResourceMixin(object):
 
+    # The KeysetPaginator used by paginate
+    paginator = None
+
+    @property
+    def request(self):
+        """The request that is being handled. The webargs module checks for the
+        existence of this property to determine whether the use_args decorator
+        is used on a function or a method. If it doesn't exist, it will think
+        our methods are ordinary functions and mix up the self and request
+        parameters. It is kept per request (and not on the resource object,
+        which is shared by all requests), so it is safe for concurrent
+        requests."""
+        request = _current_request.get()
+        if request is None:
+            raise AttributeError("No request is being handled")
+        return request
+
+    @request.setter
+    def request(self, request):
+        _current_request.set(request)
+
     def _set_request(self, request):
         self.request = request
 
-    def _create_routeset(self, handlers, default_name, name_prefix):
-
-        """We decorate each handler and add the _set_request function, so that before
-        the handler is actually called, it stores the request in a class property on
-        the class that extends the RoutableResourceMixin. The webargs module checks
-        for the existence of this property to determine whether the use_args decorator
-        is used on a function or a method. If we don't set it, it will think our
-        methods are ordinary functions and mix up the self and request parameters."""
-        def add_request_registration(handler_function):
-            def set_request_and_handle(request, *args, **kwargs):
-                self._set_request(request)
-                return handler_function(request, *args, **kwargs)  
-            return set_request_and_handle        
+    def paginate(self, queryset):
+        """Returns the page of the queryset for the request that is being
+        handled, for use in index. The paginator attribute is used, or a
+        KeysetPaginator ordered by primary key when it isn't set."""
+        paginator = self.paginator
+        if paginator is None:
+            paginator = KeysetPaginator()
+        return paginator.paginate(self.request, queryset)
 
+    def _create_routeset(self, handlers, default_name, name_prefix):
         routeset = RouteSet(name_prefix)
-        for handler, data in handlers.items():          
+        for handler, data in handlers.items():
             if hasattr(self, handler):
-                handle_func = getattr(self, handler);               
+                handle_func = getattr(self, handler);
                 routeset.add_route(data.get('name', default_name), data['method'],
-                                   add_request_registration(handle_func))
+                                   handle_func)
         return routeset
 
     def get_list_handlers(self):
@@ -112,4 +232,4 @@ class RoutableResourceMixin(object):
 
     def item_urls(self, prefix=None):
         handlers = self.get_item_handlers()
-        return self._create_routeset(handlers, 'item', prefix).urls
\ No newline at end of file
+        return self._create_routeset(handlers, 'item', prefix).urls
@@ -0,0 +1,209 @@
+"""Serializers for collections of resources that all have the same shape.
+
+Building a Representation per item of a large collection repeats the same
+work for every item: adding the properties one by one, reversing the routes of
+the links and hoisting the curies. A ResourceSchema declares the shape once:
+
+    person_schema = ResourceSchema(
+        fields=['id', 'name', ('age', lambda person: person.get_age())],
+        links={
+            'self': {'route': 'person-item', 'kwargs': {'person_id': 'id'}},
+            'cr:profile': {'route': 'person-profile',
+                           'kwargs': {'person_id': 'id',
+                                      'profile_id': 'profile.id'},
+                           'title': 'Profile'},
+        },
+        curies={'cr': '/docs/{rel}.html'})
+
+Every route is reversed only once, into a template that the values of an item
+are formatted into. Items can be model instances or dicts (like the rows of
+QuerySet.values()). The values of the link kwargs are not validated against
+the route patterns.
+
+    doc = Representation(request)
+    person_schema.add_object_list(doc, 'cr:person', Person.objects.all())
+
+The curies are added to the document once, instead of to every item."""
+
+import operator
+from functools import lru_cache
+from urllib.parse import quote
+from collections.abc import Iterator
+
+from django.core.signals import setting_changed
+from django.urls import get_script_prefix, get_urlconf, NoReverseMatch
+from django.urls import reverse as django_reverse
+from django.utils.translation import get_language
+
+from restutils.hal import default_titles, contains_curie, _fieldsets
+from restutils.lib.json_encoding import encode
+from restutils.lib.uri_tools import full_uri
+from restutils.magicreverse import reverse_path
+
+# Stand-ins for the kwargs when a route is reversed into a template. They are
+# digits, so that they match most route patterns.
+_placeholder_base = 7319046250000
+
+
+@lru_cache(maxsize=1024)
+def _route_template(urlconf, language, script_prefix, route_name,
+                    kwarg_names):
+    """Returns the path of the route as a str.format template with a field per
+    kwarg, or None when the route can't be reversed that way. The language is
+    part of the key for routes in i18n_patterns."""
+    placeholders = [str(_placeholder_base + ix)
+                    for ix in range(len(kwarg_names))]
+    try:
+        path = django_reverse(route_name, urlconf=urlconf,
+                              kwargs=dict(zip(kwarg_names, placeholders)))
+    except NoReverseMatch:
+        return None
+    template = path.replace('{', '{{').replace('}', '}}')
+    for ix, placeholder in enumerate(placeholders):
+        if template.count(placeholder) != 1:
+            return None
+        template = template.replace(placeholder, '{%d}' % ix)
+    return template
+
+
+def _clear_caches(**kwargs):
+    if kwargs['setting'] == 'ROOT_URLCONF':
+        _route_template.cache_clear()
+
+setting_changed.connect(_clear_caches)
+
+
+def _quote(value):
+    if type(value) is int:
+        return str(value)
+    # The characters that django's reverse leaves unquoted
+    return quote(str(value), safe="!$&'()*+,;=/~:@")
+
+
+def _getters(source):
+    """Returns the getters of a field for model instances and for dicts."""
+    if callable(source):
+        return source, source
+    return operator.attrgetter(source), operator.itemgetter(source)
+
+
+class ResourceSchema(object):
+    """The shape of a resource. fields is a list of names, or (name, source)
+    tuples where the source is an attribute name (dots are followed for model
+    instances) or a function of the item. links maps link relations to a dict
+    with the route name, the kwargs of the route (mapping the kwarg names to
+    sources) and an optional title. curies maps curie names to their
+    templates."""
+
+    def __init__(self, fields, links=None, curies=None):
+        self.fields = [field if isinstance(field, tuple) else (field, field)
+                       for field in fields]
+        self.links = links or {}
+        self.curies = curies or {}
+
+    def compile(self, request):
+        """Returns the serializer of the items for the request."""
+        return ResourceSerializer(self, request)
+
+    def used_curies(self):
+        names = set(rel[:rel.index(':')] for rel in self.links
+                    if contains_curie(rel))
+        return [(name, href) for name, href in self.curies.items()
+                if name in names]
+
+    def add_object_list(self, representation, rel, items):
+        """Embeds the items in the representation. items can also be an
+        iterator, which is streamed, or a callable that returns the items,
+        which is only called when the representation is serialized."""
+        serializer = self.compile(representation.request)
+        for name, href in self.used_curies():
+            representation.add_curie(name, href)
+        if callable(items):
+            representation.add_object_list(
+                rel, lambda: serializer.wrap_all(items()))
+        else:
+            representation.add_object_list(rel, serializer.wrap_all(items))
+
+
+class _CompiledLink(object):
+
+    __slots__ = ('rel', 'route_name', 'kwarg_names', 'getters', 'template',
+                 'title')
+
+    def __init__(self, request, rel, spec):
+        self.rel = rel
+        self.route_name = spec['route']
+        kwargs = spec.get('kwargs', {})
+        self.kwarg_names = tuple(kwargs)
+        self.getters = [_getters(source) for source in kwargs.values()]
+        self.title = spec.get('title') or default_titles.get(rel)
+        template = _route_template(get_urlconf(), get_language(),
+                                   get_script_prefix(), self.route_name,
+                                   self.kwarg_names)
+        self.template = None
+        if template is not None:
+            self.template = full_uri(request, template)
+
+    def href(self, request, item, is_dict):
+        values = [getters[is_dict](item) for getters in self.getters]
+        if self.template is not None:
+            return self.template.format(*[_quote(value) for value in values])
+        return full_uri(request, reverse_path(
+            self.route_name, dict(zip(self.kwarg_names, values))))
+
+
+class ResourceSerializer(object):
+    """Turns items into HAL dicts, for the request it was compiled for. Fields
+    that the ?fields= query parameter of the request doesn't ask for are left
+    out."""
+
+    def __init__(self, schema, request):
+        self.request = request
+        requested = _fieldsets(request)[0]
+        self.fields = [(name, _getters(source))
+                       for name, source in schema.fields
+                       if requested is None or name in requested]
+        self.links = [_CompiledLink(request, rel, spec)
+                      for rel, spec in schema.links.items()]
+
+    def to_dict(self, item):
+        is_dict = isinstance(item, dict)
+        links = {}
+        for link in self.links:
+            link_data = {'href': link.href(self.request, item, is_dict)}
+            if link.title is not None:
+                link_data['title'] = link.title
+            links[link.rel] = link_data
+        data = {'_links': links} if links else {}
+        for name, getters in self.fields:
+            data[name] = getters[is_dict](item)
+        return data
+
+    def to_json(self, item, encoder=None):
+        return encode(self.to_dict(item), encoder=encoder)
+
+    def wrap(self, item):
+        return SerializedItem(self, item)
+
+    def wrap_all(self, items):
+        """Returns the items as objects that can be embedded in a
+        Representation. An iterator stays an iterator."""
+        if isinstance(items, Iterator):
+            return (SerializedItem(self, item) for item in items)
+        return [SerializedItem(self, item) for item in items]
+
+
+class SerializedItem(object):
+    """An item that can be embedded in a Representation. Its curies have
+    already been added to the representation by the schema."""
+
+    __slots__ = ('serializer', 'item')
+
+    _curie_names = frozenset()
+
+    def __init__(self, serializer, item):
+        self.serializer = serializer
+        self.item = item
+
+    def to_dict(self):
+        return self.serializer.to_dict(self.item)
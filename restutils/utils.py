@@ -1,42 +1,167 @@
-import json
+import re
+from functools import lru_cache
 from urllib.parse import urlparse
-from isodate import datetime_isoformat
 from django.conf import settings
-from django.core.urlresolvers import resolve
+from django.core.signals import setting_changed
+from django.urls import resolve, get_resolver, get_urlconf
 from django.http import Http404
-from django.utils.timezone import is_naive, make_aware, get_current_timezone
+from django.utils.translation import get_language
 
-from restutils.exceptions import BadRequest
+from restutils.exceptions import BadRequest, PayloadTooLarge
+from restutils.lib.json_encoding import decode
+from restutils.lib import msgpack_encoding
+# iso_date is still imported from here
+from restutils.lib.dates import iso_date, iso_dates
 
 
-def iso_date(date):
-    if date is not None:
-        if is_naive(date):
-            date = make_aware(date, get_current_timezone())
-        # NOTE naive formatting generates bad non-iso strings
-        # return date.strftime("%Y-%m-%dT%H:%M:%S%z")
-        # replaced with real isodate
-        return datetime_isoformat(date)
+@lru_cache(maxsize=4096)
+def _resolve_kwargs(path, urlconf, language):
+    # The language is part of the key for routes in i18n_patterns
+    return resolve(path, urlconf).kwargs
 
 
-def extract_from_uri(uri, fields):
+@lru_cache(maxsize=None)
+def _route_patterns(resolver, language):
+    # The resolver has a reverse_dict per language, with the language prefix
+    # of i18n_patterns in the patterns
+    patterns = {}
+    for key, possibilities in resolver.reverse_dict.lists():
+        if isinstance(key, str):
+            possibility = possibilities[-1]
+            pattern, defaults = possibility[1:3]
+            # Django 2.0 added the path converters to the tuple
+            converters = possibility[3] if len(possibility) > 3 else {}
+            patterns[key] = (re.compile('^/' + pattern), defaults, converters)
+    return patterns
+
+
+def _clear_caches(**kwargs):
+    if kwargs['setting'] == 'ROOT_URLCONF':
+        _resolve_kwargs.cache_clear()
+        _route_patterns.cache_clear()
+
+setting_changed.connect(_clear_caches)
+
+
+def _path_kwargs(path, route_name):
+    if route_name is not None:
+        route = _route_patterns(get_resolver(get_urlconf()),
+                                get_language()).get(route_name)
+        match = route and route[0].match(path)
+        if match:
+            kwargs = match.groupdict()
+            converters = route[2]
+            try:
+                for key, value in kwargs.items():
+                    if key in converters:
+                        kwargs[key] = converters[key].to_python(value)
+            except ValueError:
+                return None
+            kwargs.update(route[1])
+            return kwargs
+    try:
+        return _resolve_kwargs(path, get_urlconf(), get_language())
+    except Http404:
+        return None
+
+
+def _extract(uri, fields, route_name):
+    """Returns the requested kwargs, or None when the URI is invalid."""
     if type(uri) != str:
         raise ValueError("URI is not of string type")
-    uri_parts = urlparse(uri)
+    kwargs = _path_kwargs(urlparse(uri).path, route_name)
+    if kwargs is None:
+        return None
     try:
-        parsed_path = resolve(uri_parts.path)
-    except Http404:
+        if type(fields) is list:
+            return {field: kwargs[field] for field in fields}
+        else:
+            return kwargs[fields]
+    except KeyError:
+        return None
+
+
+def extract_from_uri(uri, fields, route_name=None):
+    result = _extract(uri, fields, route_name)
+    if result is None:
         raise BadRequest("Invalid URI: "+ uri)
+    return result
+
+
+def extract_from_uris(uris, fields, route_name=None):
+    """Like extract_from_uri, but for a list of URIs. Returns a list with the
+    kwargs of every URI. Resolved paths are cached, and when you pass the name
+    of the route that the URIs point to, they are matched against that route
+    directly. Raises a single BadRequest that lists all invalid URIs."""
+    results = []
+    invalid_uris = []
+    for uri in uris:
+        result = _extract(uri, fields, route_name)
+        if result is None:
+            invalid_uris.append(uri)
+        results.append(result)
+    if invalid_uris:
+        raise BadRequest("Invalid URIs: " + ', '.join(invalid_uris))
+    return results
 
-    if type(fields) is list:
-        return {field: parsed_path.kwargs[field] for field in fields}
-    else:
-        return parsed_path.kwargs[fields]
 
+# Bodies are read in chunks of this many bytes when their size is limited
+_read_size = 64 * 1024
 
-def decode_json_data(request):
+
+def _read_body(request, max_size):
+    """Returns the body of the request, or raises PayloadTooLarge when it is
+    larger than max_size bytes. The Content-Length header is checked before
+    the body is read, and the bytes that are read are counted, because the
+    header can be missing or wrong."""
     try:
-        parsed_body = json.loads(request.body.decode())
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
     except ValueError:
-        raise BadRequest("Error trying to parse body as JSON")
+        content_length = 0
+    if content_length > max_size:
+        raise PayloadTooLarge()
+    if hasattr(request, '_body'):
+        # Already read, by the view or another middleware
+        body = request.body
+    else:
+        chunks = []
+        size = 0
+        while size <= max_size:
+            chunk = request.read(min(_read_size, max_size + 1 - size))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+        body = b''.join(chunks)
+        if size <= max_size:
+            # Like HttpRequest.body does, so that request.body still works
+            request._body = body
+    if len(body) > max_size:
+        raise PayloadTooLarge()
+    return body
+
+
+def decode_json_data(request, max_size=None, schema=None):
+    """Parses the JSON request body, or the MessagePack body when the request
+    has a MessagePack content type. The body is parsed from bytes, so that no
+    decoded copy of it is made. Raises PayloadTooLarge when the body is larger
+    than max_size bytes or, by default, the RESTUTILS_MAX_BODY_SIZE setting.
+    When a restutils.validation.BodySchema is given, the parsed body is
+    validated with it, which raises ValidationFailed for invalid bodies."""
+    if max_size is None:
+        max_size = getattr(settings, 'RESTUTILS_MAX_BODY_SIZE', None)
+    body = request.body if max_size is None else _read_body(request, max_size)
+    if (msgpack_encoding.has_msgpack and
+            msgpack_encoding.is_msgpack(request.META.get('CONTENT_TYPE', ''))):
+        try:
+            parsed_body = msgpack_encoding.loads(body)
+        except ValueError:
+            raise BadRequest("Error trying to parse body as MessagePack")
+    else:
+        try:
+            parsed_body = decode(body)
+        except ValueError:
+            raise BadRequest("Error trying to parse body as JSON")
+    if schema is not None:
+        schema.validate(parsed_body)
     return parsed_body
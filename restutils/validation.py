@@ -0,0 +1,244 @@
+"""Declarative schemas for request bodies.
+
+A BodySchema is compiled once, into nested validator functions, when it is
+created:
+
+    person_schema = BodySchema({
+        'name': String(max_length=100),
+        'age': Integer(min_value=0, required=False),
+        'tags': Array(String(), max_items=10),
+        'address': Object({'city': String()}, nullable=True),
+    })
+
+    def create(self, request):
+        data = decode_json_data(request, schema=person_schema)
+
+A dict is short for an Object. Validation doesn't stop at the first problem:
+all problems (up to max_errors) are raised together as a ValidationFailed,
+which VndErrorMiddleware returns as a single vnd.error document with an
+embedded error per problem. Their path is the JSON Pointer (RFC6901) of the
+invalid value, like /tags/3. Arrays are validated item by item, in place, and
+the pointers are only built for invalid values, so that large bodies are
+cheap to validate."""
+
+import re
+
+from restutils.exceptions import BadRequest, ValidationFailed
+
+
+class _Stop(Exception):
+    pass
+
+
+def _pointer(path):
+    # A path is a linked list of (parent, key) tuples, with None as the root
+    keys = []
+    while path is not None:
+        path, key = path
+        keys.append(str(key).replace('~', '~0').replace('/', '~1'))
+    return ''.join('/' + key for key in reversed(keys))
+
+
+class _Errors(object):
+
+    __slots__ = ('errors', 'max_errors')
+
+    def __init__(self, max_errors):
+        self.errors = []
+        self.max_errors = max_errors
+
+    def add(self, path, message):
+        self.errors.append(BadRequest(message, path=_pointer(path)))
+        if len(self.errors) >= self.max_errors:
+            raise _Stop()
+
+
+class Type(object):
+    """The base class of the value types. Values can be left out of their
+    object unless they are required, and can be null when they are
+    nullable."""
+
+    def __init__(self, required=True, nullable=False):
+        self.required = required
+        self.nullable = nullable
+
+    def compile_value(self):
+        """Returns a function (value, path, errors) that checks a value that
+        is not None."""
+        raise NotImplementedError()
+
+    def compile(self):
+        check_value = self.compile_value()
+        if self.nullable:
+            def check(value, path, errors):
+                if value is not None:
+                    check_value(value, path, errors)
+        else:
+            def check(value, path, errors):
+                if value is None:
+                    errors.add(path, "May not be null")
+                else:
+                    check_value(value, path, errors)
+        return check
+
+
+class String(Type):
+
+    def __init__(self, min_length=None, max_length=None, pattern=None,
+                 choices=None, **kwargs):
+        super(String, self).__init__(**kwargs)
+        self.min_length = min_length
+        self.max_length = max_length
+        self.pattern = pattern
+        self.choices = choices
+
+    def compile_value(self):
+        min_length = self.min_length
+        max_length = self.max_length
+        match = self.pattern and re.compile(self.pattern).fullmatch
+        choices = self.choices and frozenset(self.choices)
+
+        def check(value, path, errors):
+            if type(value) is not str:
+                errors.add(path, "Expected a string")
+                return
+            if min_length is not None and len(value) < min_length:
+                errors.add(path, "Shorter than %d characters" % min_length)
+            if max_length is not None and len(value) > max_length:
+                errors.add(path, "Longer than %d characters" % max_length)
+            if match and not match(value):
+                errors.add(path, "Doesn't match the pattern %s" %
+                           self.pattern)
+            if choices and value not in choices:
+                errors.add(path, "Not one of %s" %
+                           ', '.join(sorted(choices)))
+        return check
+
+
+class Number(Type):
+    """Integers and floats (but not booleans)."""
+
+    types = (int, float)
+    expected = "Expected a number"
+
+    def __init__(self, min_value=None, max_value=None, **kwargs):
+        super(Number, self).__init__(**kwargs)
+        self.min_value = min_value
+        self.max_value = max_value
+
+    def compile_value(self):
+        types = self.types
+        expected = self.expected
+        min_value = self.min_value
+        max_value = self.max_value
+
+        def check(value, path, errors):
+            if type(value) not in types:
+                errors.add(path, expected)
+                return
+            if min_value is not None and value < min_value:
+                errors.add(path, "Less than %s" % (min_value,))
+            if max_value is not None and value > max_value:
+                errors.add(path, "More than %s" % (max_value,))
+        return check
+
+
+class Integer(Number):
+
+    types = (int,)
+    expected = "Expected an integer"
+
+
+class Boolean(Type):
+
+    def compile_value(self):
+        def check(value, path, errors):
+            if type(value) is not bool:
+                errors.add(path, "Expected a boolean")
+        return check
+
+
+class Object(Type):
+    """An object with the given fields, a dict of names and Types. Other
+    fields are allowed, unless allow_extra is False."""
+
+    def __init__(self, fields, allow_extra=True, **kwargs):
+        super(Object, self).__init__(**kwargs)
+        self.fields = {name: _type(field) for name, field in fields.items()}
+        self.allow_extra = allow_extra
+
+    def compile_value(self):
+        fields = [(name, field.required, field.compile())
+                  for name, field in self.fields.items()]
+        names = frozenset(self.fields)
+        allow_extra = self.allow_extra
+
+        def check(value, path, errors):
+            if type(value) is not dict:
+                errors.add(path, "Expected an object")
+                return
+            for name, required, check_field in fields:
+                if name in value:
+                    check_field(value[name], (path, name), errors)
+                elif required:
+                    errors.add((path, name), "This field is required")
+            if not allow_extra:
+                for name in value:
+                    if name not in names:
+                        errors.add((path, name), "Unknown field")
+        return check
+
+
+class Array(Type):
+    """An array of which every item is of the items Type."""
+
+    def __init__(self, items=None, min_items=None, max_items=None, **kwargs):
+        super(Array, self).__init__(**kwargs)
+        self.items = items if items is None else _type(items)
+        self.min_items = min_items
+        self.max_items = max_items
+
+    def compile_value(self):
+        check_item = self.items and self.items.compile()
+        min_items = self.min_items
+        max_items = self.max_items
+
+        def check(value, path, errors):
+            if type(value) is not list:
+                errors.add(path, "Expected an array")
+                return
+            if min_items is not None and len(value) < min_items:
+                errors.add(path, "Fewer than %d items" % min_items)
+            if max_items is not None and len(value) > max_items:
+                errors.add(path, "More than %d items" % max_items)
+            if check_item:
+                for ix, item in enumerate(value):
+                    check_item(item, (path, ix), errors)
+        return check
+
+
+def _type(value):
+    if isinstance(value, dict):
+        return Object(value)
+    return value
+
+
+class BodySchema(object):
+    """The schema of a request body. root is a Type, or a dict of fields for
+    an Object. At most max_errors problems are reported."""
+
+    def __init__(self, root, max_errors=100):
+        self.root = _type(root)
+        self.max_errors = max_errors
+        self._check = self.root.compile()
+
+    def validate(self, data):
+        """Returns the data, or raises ValidationFailed."""
+        errors = _Errors(self.max_errors)
+        try:
+            self._check(data, None, errors)
+        except _Stop:
+            pass
+        if errors.errors:
+            raise ValidationFailed(errors.errors)
+        return data
@@ -7,8 +7,5 @@ setup(
         'restutils',
         'restutils.lib',
     ],
-    install_requires=[
-        'isodate',
-    ],
 )
 
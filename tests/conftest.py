@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.settings')
+
+import django
+django.setup()
+
+from django.test import RequestFactory
+
+
+@pytest.fixture
+def rf():
+    return RequestFactory()
+
+
+@pytest.fixture(scope='session')
+def django_db():
+    from django.db import connection
+    # Creates the tables of the test models
+    connection.creation.create_test_db(verbosity=0)
+    yield
+    connection.creation.destroy_test_db(':memory:', verbosity=0)
+
+
+@pytest.fixture
+def persons(django_db):
+    from tests.models import Person
+    persons = [Person.objects.create(name='Person %d' % ix, age=ix % 3)
+               for ix in range(10)]
+    yield persons
+    Person.objects.all().delete()
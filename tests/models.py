@@ -0,0 +1,9 @@
+from django.db import models
+
+
+class Person(models.Model):
+    name = models.CharField(max_length=100)
+    age = models.IntegerField()
+
+    class Meta:
+        app_label = 'tests'
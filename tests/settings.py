@@ -0,0 +1,19 @@
+"""Minimal Django settings for the tests."""
+
+SECRET_KEY = 'tests'
+DEBUG = False
+ALLOWED_HOSTS = ['testserver']
+ROOT_URLCONF = 'tests.urls'
+USE_TZ = True
+INSTALLED_APPS = ['tests']
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
+MIDDLEWARE = [
+    'restutils.middleware.MagicReverseMiddleware',
+    'restutils.middleware.RequestDataMiddleware',
+    'restutils.middleware.VndErrorMiddleware',
+]
@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+from django.test import AsyncClient, Client
+
+from restutils.router import Route
+
+from tests.urls import view_calls
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_async_json_view():
+    response = run(AsyncClient().get('/async-etag/'))
+    assert response.status_code == 200
+    assert json.loads(response.content) == {'version': 1}
+
+
+def test_async_etag_func_runs_in_a_thread():
+    client = AsyncClient()
+    response = run(client.get('/async-etag/'))
+    assert response.has_header('ETag')
+    response = run(client.get(
+        '/async-etag/', headers={'If-None-Match': response['ETag']}))
+    assert response.status_code == 304
+
+
+def test_async_response_cache_backend_runs_in_a_thread():
+    client = AsyncClient()
+    first = run(client.get('/async-cached/'))
+    second = run(client.get('/async-cached/'))
+    assert first.status_code == 200
+    assert second.content == first.content
+
+
+def test_async_view_errors_become_vnd_errors():
+    response = run(AsyncClient().get('/async-error/'))
+    assert response.status_code == 404
+    assert json.loads(response.content) == {'message': 'No such thing',
+                                            'logref': '42'}
+
+
+def test_route_with_a_coroutine_handler_is_async():
+    async def handler(request):
+        pass
+
+    route = Route()
+    route.add_handler('GET', handler)
+    assert route.is_async()
+    assert asyncio.iscoroutinefunction(route.view)
+    route = Route()
+    route.add_handler('GET', lambda request: None)
+    assert not route.is_async()
+
+
+def test_async_route_runs_sync_handlers():
+    client = AsyncClient()
+    response = run(client.get('/resources/3/'))
+    assert response.content == b'async 3'
+    response = run(client.put('/resources/3/'))
+    assert response.content == b'sync PUT'
+    response = run(client.options('/resources/3/'))
+    assert (set(response['Allow'].split(', ')) ==
+            {'OPTIONS', 'GET', 'HEAD', 'PUT'})
+    response = run(client.post('/resources/3/'))
+    assert response.status_code == 405
+
+
+def test_async_route_with_sync_client():
+    assert Client().get('/resources/4/').content == b'async 4'
+
+
+def test_async_view_with_lazy_database_values(persons):
+    response = run(AsyncClient().get('/async-lazy/'))
+    assert response.status_code == 200
+    data = json.loads(response.content)
+    assert data['count'] == 10
+    assert data['_embedded']['first']['id'] == persons[0].age
+    assert data['_embedded']['items'] == [
+        {'ix': ix, 'name': persons[ix].name} for ix in range(2)]
+
+
+def test_async_view_with_lazy_values_and_fields(persons):
+    response = run(AsyncClient().get('/async-lazy/?fields=name'))
+    data = json.loads(response.content)
+    assert 'count' not in data
+    assert [item['name'] for item in data['_embedded']['items']] == [
+        person.name for person in persons[:2]]
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from django.db import transaction
+from django.test import AsyncClient, Client, modify_settings
+
+
+def post(path, operations, client=None, content_type='application/json'):
+    client = client or Client()
+    return client.post(path, json.dumps(operations),
+                       content_type=content_type)
+
+
+@pytest.mark.parametrize('path', ['/batch/', '/batch-serial/'])
+def test_results_in_order(path):
+    response = post(path, [
+        {'method': 'GET', 'path': '/data/'},
+        {'path': 'http://testserver/representation/'},
+        {'method': 'PUT', 'path': '/resources/1/', 'body': {'a': 1}},
+        {'method': 'GET', 'path': '/resources/2/'},
+    ])
+    assert response.status_code == 200
+    results = json.loads(response.content)['results']
+    assert [result['status'] for result in results] == [200] * 4
+    assert results[0]['body'] == {'name': 'Persön', 'items': [1, 2, 3]}
+    assert results[1]['body']['name'] == 'Persön'
+    assert results[1]['headers']['Content-Type'].startswith(
+        'application/hal+json')
+    assert results[2]['body'] == 'sync PUT'
+    assert results[3]['body'] == 'async 2'
+
+
+def test_errors_per_operation():
+    response = post('/batch/', [
+        {'path': '/error/'},
+        {'path': '/nowhere/'},
+        {'path': '/batch/'},
+        {'path': '/data/'},
+    ])
+    results = json.loads(response.content)['results']
+    assert [result['status'] for result in results] == [404, 404, 400, 200]
+    assert results[0]['body']['logref'] == '42'
+    assert results[0]['headers']['Content-Type'].startswith(
+        'application/vnd.error+json')
+
+
+@pytest.mark.parametrize('operations', [
+    {'path': '/data/'},
+    ['/data/'],
+    [{'method': 'BREW', 'path': '/data/'}],
+    [{'path': 'data/'}],
+    [{'path': '/data/'}] * 5,
+])
+def test_invalid_batches(operations):
+    assert post('/batch/', operations).status_code == 400
+
+
+def test_only_post():
+    assert Client().get('/batch/').status_code == 405
+
+
+@pytest.mark.parametrize('content_type', [
+    'text/plain', 'application/x-www-form-urlencoded', 'multipart/form-data'])
+def test_only_json_bodies(content_type):
+    response = post('/batch/', [{'path': '/data/'}],
+                    content_type=content_type)
+    assert response.status_code == 415
+
+
+@modify_settings(MIDDLEWARE={
+    'prepend': 'django.middleware.csrf.CsrfViewMiddleware'})
+def test_csrf_protected():
+    client = Client(enforce_csrf_checks=True)
+    operations = [{'method': 'PUT', 'path': '/resources/1/'}]
+    assert post('/batch/', operations, client).status_code == 403
+
+    client.cookies['csrftoken'] = 'a' * 32
+    response = client.post('/batch/', json.dumps(operations),
+                           content_type='application/json',
+                           HTTP_X_CSRFTOKEN='a' * 32)
+    assert response.status_code == 200
+
+
+def test_reads_run_concurrently():
+    response = post('/batch/', [{'path': '/thread/'}] * 2)
+    threads = [result['body']['thread']
+               for result in json.loads(response.content)['results']]
+    assert threading.get_ident() not in threads
+
+
+def test_reads_run_one_by_one_in_transactions(django_db):
+    with transaction.atomic():
+        response = post('/batch/', [{'path': '/thread/'}] * 2)
+    threads = [result['body']['thread']
+               for result in json.loads(response.content)['results']]
+    assert threads == [threading.get_ident()] * 2
+
+
+def test_asgi_batch_links():
+    response = asyncio.run(AsyncClient().post(
+        '/batch/', json.dumps([{'path': '/representation/'}]),
+        content_type='application/json'))
+    assert response.status_code == 200
+    [result] = json.loads(response.content)['results']
+    assert result['body']['_links']['self']['href'] == (
+        'http://testserver/representation/')
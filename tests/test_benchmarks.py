@@ -0,0 +1,21 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'benchmarks')
+
+
+def test_benchmarks_run():
+    # Every benchmark once, without timing, so the suite keeps working
+    pytest.importorskip('pytest_benchmark')
+    env = dict(os.environ)
+    env.pop('DJANGO_SETTINGS_MODULE', None)
+    result = subprocess.run(
+        [sys.executable, '-m', 'pytest', '-q', '-p', 'no:cacheprovider',
+         '--benchmark-disable', '-o', 'addopts=', BENCHMARKS],
+        cwd=os.path.dirname(BENCHMARKS), env=env, stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT)
+    assert result.returncode == 0, result.stdout.decode('utf-8')
@@ -0,0 +1,88 @@
+import gzip
+import json
+
+import pytest
+
+from django.test import Client, override_settings
+
+from restutils.lib.compression import (_accepts_gzip, compress_bytes,
+                                       compression_level)
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    ('gzip', True),
+    ('deflate, GZIP;q=0.5', True),
+    ('*', True),
+    ('*;q=0.5, gzip;q=0', False),
+    ('gzip;q=0, *', False),
+    ('br, *;q=0', False),
+    ('gzip, *;q=0', True),
+    ('gzip;q=0', False),
+    ('gzip;q=x', False),
+    ('br, deflate', False),
+    ('', False),
+])
+def test_accepts_gzip(accept_encoding, expected):
+    assert _accepts_gzip(accept_encoding) is expected
+
+
+def test_compression_level():
+    assert compression_level(False) is None
+    assert compression_level(True) == 6
+    assert compression_level(9) == 9
+    assert compression_level() is None
+    with override_settings(RESTUTILS_COMPRESSION=True,
+                           RESTUTILS_COMPRESSION_LEVEL=1):
+        assert compression_level() == 1
+
+
+def test_compress_bytes_is_deterministic():
+    data = b'x' * 1000
+    assert compress_bytes(data, 6) == compress_bytes(data, 6)
+    assert gzip.decompress(compress_bytes(data, 6)) == data
+
+
+def test_compressed_response():
+    response = Client().get('/compressed/', HTTP_ACCEPT_ENCODING='gzip')
+    assert response['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response['Vary']
+    assert response['ETag'].startswith('W/"')
+    assert int(response['Content-Length']) == len(response.content)
+    data = json.loads(gzip.decompress(response.content))
+    assert data == {'items': list(range(500))}
+
+
+def test_not_compressed_without_accept_encoding():
+    response = Client().get('/compressed/')
+    assert not response.has_header('Content-Encoding')
+    assert 'Accept-Encoding' in response['Vary']
+    assert json.loads(response.content) == {'items': list(range(500))}
+
+
+def test_small_bodies_are_not_compressed():
+    response = Client().get('/compressed/?size=3', HTTP_ACCEPT_ENCODING='gzip')
+    assert not response.has_header('Content-Encoding')
+
+
+def test_compress_false():
+    with override_settings(RESTUTILS_COMPRESSION=True):
+        response = Client().get('/uncompressed/', HTTP_ACCEPT_ENCODING='gzip')
+    assert not response.has_header('Content-Encoding')
+
+
+def test_compressed_stream():
+    response = Client().get('/compressed-stream/',
+                            HTTP_ACCEPT_ENCODING='gzip')
+    assert response.streaming
+    assert response['Content-Encoding'] == 'gzip'
+    content = gzip.decompress(b''.join(response.streaming_content))
+    assert json.loads(content) == [{'id': ix} for ix in range(500)]
+
+
+def test_compressed_errors():
+    with override_settings(RESTUTILS_COMPRESSION=True):
+        response = Client().get('/error/?message=' + 'x' * 500,
+                                HTTP_ACCEPT_ENCODING='gzip')
+    assert response.status_code == 404
+    assert response['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.content))['logref'] == '42'
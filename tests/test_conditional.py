@@ -0,0 +1,61 @@
+from django.test import Client
+
+from tests.urls import versions, view_calls
+
+
+def test_etag_is_a_hash_of_the_body():
+    client = Client()
+    response = client.get('/etag/')
+    etag = response['ETag']
+    assert etag.startswith('"') and etag.endswith('"')
+    assert client.get('/etag/')['ETag'] == etag
+
+    response = client.get('/etag/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response.content == b''
+
+    versions['person'] += 1
+    try:
+        response = client.get('/etag/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+    finally:
+        versions['person'] -= 1
+
+
+def test_etag_func_etag_depends_on_the_accept_header():
+    client = Client()
+    response = client.get('/etag-func/', HTTP_ACCEPT='application/json')
+    again = client.get('/etag-func/', HTTP_ACCEPT='application/json')
+    other = client.get('/etag-func/', HTTP_ACCEPT='application/hal+json')
+    assert response['ETag'] == again['ETag']
+    assert response['ETag'] != other['ETag']
+
+
+def test_etag_func_skips_the_view():
+    client = Client()
+    response = client.get('/etag-func/')
+    assert response.status_code == 200
+    assert response['Last-Modified'] == 'Thu, 02 Jan 2020 03:04:05 GMT'
+    calls = view_calls['etag_func']
+
+    response = client.get('/etag-func/', HTTP_IF_NONE_MATCH=response['ETag'])
+    assert response.status_code == 304
+    assert response['Vary'] == 'Accept'
+    assert view_calls['etag_func'] == calls
+
+
+def test_last_modified_func():
+    client = Client()
+    response = client.get(
+        '/etag-func/', HTTP_IF_MODIFIED_SINCE='Thu, 02 Jan 2020 03:04:05 GMT')
+    assert response.status_code == 304
+    response = client.get(
+        '/etag-func/', HTTP_IF_MODIFIED_SINCE='Wed, 01 Jan 2020 00:00:00 GMT')
+    assert response.status_code == 200
+
+
+def test_etag_is_not_sent_for_failed_writes():
+    response = Client().post('/etag/', HTTP_IF_NONE_MATCH='"x"')
+    assert response.status_code == 200
+    assert not response.has_header('ETag')
@@ -0,0 +1,60 @@
+import pytest
+
+from restutils.lib.content_negotiation import (best_content_type,
+                                               parse_accept, MediaRange,
+                                               _split_media_type)
+
+HAL = 'application/hal+json; charset=utf-8'
+JSON = 'application/json; charset=utf-8'
+VND_ERROR = 'application/vnd.error+json; charset=utf-8'
+
+
+def test_parse_accept():
+    assert parse_accept('text/html;q=0.5, */*, application/JSON') == (
+        MediaRange('text', 'html', 0.5),
+        MediaRange('*', '*', 1.0),
+        MediaRange('application', 'json', 1.0),
+    )
+
+
+def test_parse_accept_skips_invalid_ranges():
+    assert parse_accept('nonsense, text/html;q=abc, *;q=2') == (
+        MediaRange('*', '*', 1.0),
+    )
+
+
+@pytest.mark.parametrize('accept, expected', [
+    ('application/hal+json', HAL),
+    ('application/json', JSON),
+    ('*/*', JSON),
+    ('*', JSON),
+    ('application/*', JSON),
+    ('text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8', JSON),
+    ('application/json;q=0.1, */*', HAL),
+    ('', JSON),
+    ('text/plain', JSON),
+    # The highest quality wins, even when it's not the optimal type
+    ('application/hal+json;q=0.5, application/json', JSON),
+    # Equal qualities prefer the most specific range
+    ('*/*, application/json', JSON),
+    # A quality of 0 means not acceptable
+    ('application/hal+json;q=0, */*', JSON),
+])
+def test_best_content_type_for_hal(accept, expected):
+    assert best_content_type('hal+json', accept) == expected
+
+
+def test_best_content_type_falls_back():
+    assert best_content_type('vnd.error', 'application/json') == JSON
+    assert best_content_type('vnd.error', 'application/hal+json') == HAL
+    assert best_content_type('vnd.error', '*/*') == JSON
+    assert best_content_type('vnd.error', 'application/vnd.error+json') == VND_ERROR
+    assert best_content_type('unknown', 'application/hal+json') == JSON
+
+
+def test_caches_are_bounded():
+    for ix in range(1000):
+        parse_accept.__wrapped__('application/x-%d, text/x-%d' % (ix, ix))
+    assert _split_media_type.cache_info().currsize <= 256
+    assert best_content_type.cache_info().maxsize == 256
+    assert parse_accept.cache_info().maxsize == 256
@@ -0,0 +1,81 @@
+import datetime
+import json
+from zoneinfo import ZoneInfo
+
+import pytest
+from django.test import override_settings
+from django.utils import timezone
+
+from restutils.lib.dates import format_datetime
+from restutils.lib.json_encoding import encode, encoders
+from restutils.utils import iso_date, iso_dates
+
+isodate = pytest.importorskip('isodate')
+
+AMSTERDAM = ZoneInfo('Europe/Amsterdam')
+
+
+def isodate_iso_date(date):
+    # iso_date as it was with isodate
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.get_current_timezone())
+    return isodate.datetime_isoformat(date)
+
+
+@pytest.mark.parametrize('date', [
+    datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+    datetime.datetime(2020, 1, 2, 3, 4, 5, 678, tzinfo=ZoneInfo('UTC')),
+    datetime.datetime(2020, 7, 2, 3, 4, 5, tzinfo=AMSTERDAM),
+    datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=datetime.timezone(
+        -datetime.timedelta(hours=5, minutes=30))),
+    datetime.datetime(999, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+])
+def test_aware_datetimes_like_isodate(date):
+    assert iso_date(date) == isodate_iso_date(date)
+
+
+@pytest.mark.parametrize('zone', ['UTC', 'Europe/Amsterdam',
+                                  'America/New_York'])
+@pytest.mark.parametrize('date', [
+    datetime.datetime(2020, 1, 2, 3, 4, 5),
+    datetime.datetime(2020, 7, 2, 3, 4, 5, 678),
+])
+def test_naive_datetimes_like_isodate(zone, date):
+    with timezone.override(ZoneInfo(zone)):
+        assert iso_date(date) == isodate_iso_date(date)
+        assert iso_dates([date]) == [isodate_iso_date(date)]
+
+
+def test_utc_is_z():
+    date = datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=ZoneInfo('UTC'))
+    assert iso_date(date) == '2020-01-02T03:04:05Z'
+    with timezone.override(ZoneInfo('UTC')):
+        assert iso_date(date.replace(tzinfo=None)) == '2020-01-02T03:04:05Z'
+    # Like isodate
+    assert iso_date(date.replace(tzinfo=datetime.timezone.utc)) == \
+        '2020-01-02T03:04:05+00:00'
+
+
+def test_pytz_timezones_are_localized():
+    pytz = pytest.importorskip('pytz')
+    zone = pytz.timezone('Europe/Amsterdam')
+    date = datetime.datetime(2020, 7, 2, 3, 4, 5)
+    assert format_datetime(date, zone) == '2020-07-02T03:04:05+02:00'
+    # Ambiguous times are an error, like with make_aware
+    with pytest.raises(pytz.AmbiguousTimeError):
+        format_datetime(datetime.datetime(2020, 10, 25, 2, 30), zone)
+
+
+def test_none_and_dates():
+    assert iso_date(None) is None
+    assert iso_dates([None, datetime.date(2020, 1, 2)]) == [None,
+                                                           '2020-01-02']
+
+
+@pytest.mark.parametrize('encoder', list(encoders))
+def test_encoders_format_dates(encoder):
+    date = datetime.datetime(2020, 1, 2, 3, 4, 5, 678, tzinfo=AMSTERDAM)
+    with override_settings(RESTUTILS_JSON_ISO_DATES=True):
+        data = json.loads(encode({'at': date, 'on': date.date()},
+                                 encoder=encoder))
+    assert data == {'at': iso_date(date), 'on': '2020-01-02'}
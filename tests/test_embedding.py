@@ -0,0 +1,128 @@
+import asyncio
+import threading
+
+import pytest
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.test import override_settings
+
+from restutils import hal
+from restutils.hal import Representation
+
+from tests.urls import ItemRepresentation, item_representation
+
+
+def producer(threads, request, ix, barrier=None):
+    def produce():
+        threads.append(threading.get_ident())
+        if barrier is not None:
+            # Only passes when the producers run at the same time
+            barrier.wait()
+        return item_representation(request, ix)
+    return produce
+
+
+def test_produced_one_by_one_by_default(rf):
+    request = rf.get('/')
+    threads = []
+    doc = Representation(request)
+    doc.add_object('first', producer(threads, request, 0))
+    doc.add_object('second', producer(threads, request, 1))
+    data = doc.to_dict()
+    assert threads == [threading.get_ident()] * 2
+    assert list(data['_embedded']) == ['first', 'second']
+
+
+@override_settings(RESTUTILS_EMBED_WORKERS=3)
+def test_produced_concurrently_with_workers(rf):
+    request = rf.get('/')
+    threads = []
+    barrier = threading.Barrier(3, timeout=5)
+    doc = Representation(request)
+    for ix in range(3):
+        doc.add_object('item%d' % ix,
+                       producer(threads, request, ix, barrier))
+    data = doc.to_dict()
+    assert threading.get_ident() not in threads
+    # In the order of declaration, with the curies hoisted once
+    assert list(data['_embedded']) == ['item0', 'item1', 'item2']
+    assert [item['id'] for item in data['_embedded'].values()] == [0, 1, 2]
+    assert [curie['name'] for curie in data['_links']['curies']] == ['it']
+
+
+@override_settings(RESTUTILS_EMBED_WORKERS=3)
+def test_worker_connections_are_closed(rf, monkeypatch):
+    calls = []
+    monkeypatch.setattr(hal, 'close_old_connections',
+                        lambda: calls.append(threading.get_ident()))
+    request = rf.get('/')
+    threads = []
+    doc = Representation(request)
+    doc.add_object('first', producer(threads, request, 0))
+    doc.add_object('second', producer(threads, request, 1))
+    doc.to_dict()
+    assert sorted(calls) == sorted(threads * 2)
+
+
+@override_settings(RESTUTILS_EMBED_WORKERS=3)
+def test_one_by_one_in_transactions(rf, django_db):
+    request = rf.get('/')
+    threads = []
+    doc = Representation(request)
+    doc.add_object('first', producer(threads, request, 0))
+    doc.add_object('second', producer(threads, request, 1))
+    with transaction.atomic():
+        doc.to_dict()
+    assert threads == [threading.get_ident()] * 2
+
+
+def test_awaitables_in_synchronous_code(rf):
+    request = rf.get('/')
+
+    async def first():
+        await asyncio.sleep(0)
+        return item_representation(request, 0)
+
+    doc = Representation(request)
+    doc.add_object('first', first)
+    doc.add_object('second', first())
+    data = doc.to_dict()
+    assert data['_embedded']['first']['id'] == 0
+    assert data['_embedded']['second']['id'] == 0
+
+
+def test_awaitables_use_the_loop_of_the_request(rf):
+    request = rf.get('/')
+    loops = []
+
+    async def first():
+        loops.append(asyncio.get_running_loop())
+        return item_representation(request, 0)
+
+    async def view():
+        doc = Representation(request)
+        doc.add_object('first', first)
+        # Like a synchronous view under ASGI
+        data = await sync_to_async(doc.to_dict)()
+        return asyncio.get_running_loop(), data
+
+    loop, data = asyncio.run(view())
+    assert loops == [loop]
+    assert data['_embedded']['first']['id'] == 0
+
+
+def test_aresolve_runs_synchronous_producers_off_the_loop(rf):
+    request = rf.get('/')
+    threads = []
+
+    async def view():
+        doc = ItemRepresentation(request)
+        doc.add_object('first', producer(threads, request, 0))
+        doc.add_object('second', producer(threads, request, 1))
+        await doc.aresolve()
+        return threading.get_ident(), doc.to_dict()
+
+    loop_thread, data = asyncio.run(view())
+    assert len(threads) == 2
+    assert loop_thread not in threads
+    assert list(data['_embedded']) == ['first', 'second']
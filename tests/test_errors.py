@@ -0,0 +1,71 @@
+import json
+
+import pytest
+from django.core.exceptions import ObjectDoesNotExist
+from django.test import override_settings
+
+from restutils.exceptions import ApiError, BadRequest, Forbidden, NotFound
+from restutils.middleware import (VndErrorMiddleware, _error_document,
+                                  _static_content)
+
+
+def process(request, exception):
+    return VndErrorMiddleware(lambda request: None).process_exception(
+        request, exception)
+
+
+@pytest.fixture
+def static_cache():
+    _static_content.cache_clear()
+    yield
+    _static_content.cache_clear()
+
+
+@pytest.mark.parametrize('exception', [NotFound(), Forbidden(), BadRequest(),
+                                       ApiError()])
+def test_static_errors_are_serialized_once(rf, static_cache, exception):
+    request = rf.get('/', HTTP_ACCEPT='application/vnd.error+json')
+    first = process(request, exception)
+    second = process(rf.get('/other/'), exception)
+    assert first.status_code == second.status_code == exception.status
+    assert first.content == second.content
+    assert json.loads(first.content) == {'message': exception.message}
+    assert first['Content-Type'].startswith('application/vnd.error+json')
+    assert _static_content.cache_info().hits == 1
+
+
+@pytest.mark.parametrize('exception', [
+    NotFound("No such person"),
+    NotFound(logref='42'),
+    NotFound(about='/docs/'),
+])
+def test_other_errors_use_the_builder(rf, static_cache, exception):
+    request = rf.get('/')
+    response = process(request, exception)
+    assert json.loads(response.content) == \
+        _error_document(request, exception).to_dict()
+    assert _static_content.cache_info().currsize == 0
+
+
+def test_static_documents_equal_built_documents(rf, static_cache):
+    request = rf.get('/')
+    response = process(request, NotFound("Resource not found"))
+    assert response.content == \
+        _error_document(request, NotFound()).to_json()
+    assert _static_content.cache_info().currsize == 1
+
+
+def test_object_does_not_exist_is_not_found(rf):
+    response = process(rf.get('/'), ObjectDoesNotExist("No person"))
+    assert response.status_code == 404
+    assert json.loads(response.content) == {'message': 'No person'}
+
+
+def test_other_exceptions_are_left_alone(rf):
+    assert process(rf.get('/'), ValueError()) is None
+
+
+def test_encoder_setting_clears_the_cache(rf, static_cache):
+    process(rf.get('/'), NotFound())
+    with override_settings(RESTUTILS_JSON_ENCODER='json'):
+        assert _static_content.cache_info().currsize == 0
@@ -0,0 +1,69 @@
+import pytest
+
+from django.urls import set_urlconf
+from django.utils import translation
+
+from restutils.exceptions import BadRequest
+from restutils.utils import extract_from_uri, extract_from_uris
+
+URI = 'http://testserver/persons/12/profiles/34/'
+
+
+def test_extract_from_uri():
+    assert extract_from_uri(URI, 'person_id') == 12
+    assert extract_from_uri(URI, ['person_id', 'profile_id']) == {
+        'person_id': 12, 'profile_id': 34}
+
+
+@pytest.mark.parametrize('uri', [
+    'http://testserver/unknown/',
+    'http://testserver/persons/12/',
+])
+def test_extract_from_invalid_uri(uri):
+    with pytest.raises(BadRequest):
+        extract_from_uri(uri, 'profile_id')
+
+
+def test_extract_from_uri_needs_a_string():
+    with pytest.raises(ValueError):
+        extract_from_uri(12, 'person_id')
+
+
+def test_extract_from_uris_with_route_name_converts_values():
+    uris = [URI, 'http://testserver/persons/1/profiles/2/']
+    expected = [{'person_id': 12, 'profile_id': 34},
+                {'person_id': 1, 'profile_id': 2}]
+    assert extract_from_uris(uris, ['person_id', 'profile_id']) == expected
+    assert extract_from_uris(uris, ['person_id', 'profile_id'],
+                             route_name='person-profile') == expected
+
+
+def test_extract_from_uris_with_wrong_route_name_resolves():
+    assert extract_from_uris([URI], 'person_id',
+                             route_name='person-item') == [12]
+
+
+def test_extract_from_uris_reports_all_invalid_uris():
+    with pytest.raises(BadRequest) as error:
+        extract_from_uris([URI, 'http://testserver/a/',
+                           'http://testserver/b/'], 'person_id')
+    assert error.value.message == (
+        'Invalid URIs: http://testserver/a/, http://testserver/b/')
+
+
+def test_extract_depends_on_the_urlconf_and_language():
+    assert extract_from_uri('/persons/1/', 'person_id') == 1
+    set_urlconf('tests.urls_alternate')
+    try:
+        with translation.override('nl'):
+            assert extract_from_uri('/nl/people/2/', 'person_id') == 2
+            assert extract_from_uris(['/nl/people/3/'], 'person_id',
+                                     route_name='person-item') == [3]
+        with translation.override('en'):
+            with pytest.raises(BadRequest):
+                extract_from_uris(['/nl/people/3/'], 'person_id',
+                                  route_name='person-item')
+            with pytest.raises(BadRequest):
+                extract_from_uri('/persons/1/', 'person_id')
+    finally:
+        set_urlconf(None)
@@ -0,0 +1,97 @@
+import pytest
+
+from django.test import RequestFactory
+
+from restutils.hal import Link, Representation
+
+
+class PersonRepresentation(Representation):
+    curies = {'cr': '/docs/{rel}.html'}
+
+
+@pytest.fixture
+def request_():
+    return RequestFactory().get('/persons/')
+
+
+def test_links_are_absolute_with_default_titles(request_):
+    doc = Representation(request_)
+    doc.add_link('self', '/persons/12/')
+    doc.add_link('other', 'http://example.com/other/')
+    assert doc.to_dict() == {'_links': {
+        'self': {'href': 'http://testserver/persons/12/',
+                 'title': 'URI of this resource'},
+        'other': {'href': 'http://example.com/other/'},
+    }}
+
+
+def test_link_object_is_not_mutated(request_):
+    link = Link(href='/persons/{id}/', title='Person')
+    doc = Representation(request_)
+    doc.add_link('find', link)
+    assert link.href == '/persons/{id}/'
+    assert doc.to_dict()['_links']['find'] == {
+        'href': 'http://testserver/persons/{id}/', 'templated': True,
+        'title': 'Person'}
+
+
+def test_link_lists_are_extended(request_):
+    doc = Representation(request_)
+    doc.add_link_list('item', ['/a/', '/b/'])
+    doc.add_link_list('item', '/c/')
+    hrefs = [link['href'] for link in doc.to_dict()['_links']['item']]
+    assert hrefs == ['http://testserver/a/', 'http://testserver/b/',
+                     'http://testserver/c/']
+
+
+def test_curies_are_added_once(request_):
+    doc = PersonRepresentation(request_)
+    doc.add_link('cr:profile', '/profile/')
+    doc.add_link('cr:pets', '/pets/')
+    assert doc.has_curie('cr')
+    assert doc.to_dict()['_links']['curies'] == [{
+        'href': 'http://testserver/docs/{rel}.html', 'name': 'cr',
+        'templated': True, 'title': 'Compact URI for namespacing'}]
+
+
+def test_curies_of_embedded_objects_move_to_the_top(request_):
+    item = PersonRepresentation(request_)
+    item.add_link('cr:profile', '/profile/')
+    doc = PersonRepresentation(request_)
+    doc.add_object_list('cr:person', [item])
+    data = doc.to_dict()
+    assert [curie['name'] for curie in data['_links']['curies']] == ['cr']
+    assert 'curies' not in data['_embedded']['cr:person'][0]['_links']
+
+
+def test_curie_only_links_are_removed_from_embedded_objects(request_):
+    item = PersonRepresentation(request_)
+    item.add_curie('cr', '/docs/{rel}.html')
+    item.add_property('id', 1)
+    doc = Representation(request_)
+    doc.add_object('person', item)
+    assert doc.to_dict()['_embedded'] == {'person': {'id': 1}}
+
+
+def test_order_of_properties_links_and_embedded(request_):
+    doc = Representation(request_)
+    doc.add_property('id', 1)
+    doc.add_link('self', '/')
+    doc.add_object('child', None)
+    doc.add_property('name', 'x')
+    assert list(doc.to_dict()) == ['id', '_links', '_embedded', 'name']
+    assert doc.to_dict()['_embedded'] == {'child': None}
+
+
+def test_data_is_a_copy(request_):
+    doc = Representation(request_)
+    doc.add_property('id', 1)
+    doc.data['id'] = 2
+    assert doc.to_dict() == {'id': 1}
+
+
+def test_slots(request_):
+    with pytest.raises(AttributeError):
+        Representation(request_).unknown = 1
+    with pytest.raises(AttributeError):
+        Link(href='/').unknown = 1
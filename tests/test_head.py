@@ -0,0 +1,59 @@
+import pytest
+
+from django.test import Client, modify_settings
+
+from tests.test_response_cache import empty_cache  # noqa: F401
+from tests.urls import view_calls
+
+HEADERS = ('Content-Type', 'ETag', 'Content-Encoding', 'Vary')
+
+
+@pytest.mark.parametrize('path', ['/data/', '/representation/', '/etag/',
+                                  '/compressed/', '/cached/', '/stream/'])
+def test_head_has_the_headers_of_get(path):
+    client = Client()
+    head = client.head(path, HTTP_ACCEPT_ENCODING='gzip')
+    get = client.get(path, HTTP_ACCEPT_ENCODING='gzip')
+    assert head.status_code == get.status_code == 200
+    assert b''.join(head) == b''
+    for header in HEADERS:
+        assert head.get(header) == get.get(header)
+
+
+@pytest.mark.parametrize('path', ['/etag/', '/compressed/', '/cached/'])
+def test_serialized_head_has_the_content_length_of_get(path):
+    # The body is needed for the cache, the ETag or the compression, so the
+    # length is known
+    client = Client()
+    head = client.head(path, HTTP_ACCEPT_ENCODING='gzip')
+    get = client.get(path, HTTP_ACCEPT_ENCODING='gzip')
+    assert int(head['Content-Length']) == len(get.content)
+
+
+@pytest.mark.parametrize('path', ['/data/', '/representation/', '/stream/'])
+def test_head_without_content_length(path):
+    assert not Client().head(path).has_header('Content-Length')
+
+
+def test_head_does_not_serialize_the_body():
+    calls = view_calls['lazy_name']
+    Client().head('/lazy/')
+    assert view_calls['lazy_name'] == calls
+    Client().get('/lazy/')
+    assert view_calls['lazy_name'] == calls + 1
+
+
+@modify_settings(MIDDLEWARE={
+    'prepend': 'django.middleware.common.CommonMiddleware'})
+def test_head_content_length_with_common_middleware():
+    client = Client()
+    assert not client.head('/data/').has_header('Content-Length')
+    head = client.head('/etag/')
+    get = client.get('/etag/')
+    assert head['Content-Length'] == get['Content-Length'] != '0'
+
+
+def test_head_does_not_cache_an_empty_body():
+    client = Client()
+    client.head('/cached/?head')
+    assert client.get('/cached/?head').content != b''
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+from django.test import Client, override_settings
+
+from restutils.lib import content_negotiation
+from restutils.lib.json_as_html import create_html, iter_html, render_html
+
+
+@pytest.fixture
+def html_media_type():
+    # The html browser view is not in the default fallback list
+    fallback_list = content_negotiation.fallback_list.copy()
+    fallbacks = content_negotiation.fallbacks.copy()
+    content_negotiation.register_media_type('html',
+                                            'text/html; charset=utf-8')
+    content_negotiation.fallbacks['json'] = 'html'
+    yield
+    content_negotiation.fallback_list.clear()
+    content_negotiation.fallback_list.update(fallback_list)
+    content_negotiation.fallbacks.clear()
+    content_negotiation.fallbacks.update(fallbacks)
+    content_negotiation.best_content_type.cache_clear()
+
+
+def body(page):
+    return page.split('<code class="json">')[1].split('</code>')[0].strip()
+
+
+def test_page_contains_the_pretty_printed_json():
+    data = {'name': 'Persön', 'items': [1, 2.5, True, None], 'empty': {},
+            'none': []}
+    page = render_html(data)
+    assert body(page) == json.dumps(data, indent=4, ensure_ascii=False)
+
+
+def test_content_is_escaped():
+    page = render_html({'<b>': '<script>alert("x")</script> & more'})
+    assert '<script>alert' not in page
+    assert '&lt;b&gt;' in page
+    assert '&lt;script&gt;' in page
+    assert '&amp; more' in page
+
+
+def test_only_whole_url_values_are_links():
+    page = render_html({'a': 'http://example.com/a/', 'b': 'see http://x.y/',
+                        'c': 'https://example.com/?a=1&b="2"'})
+    assert '"<a href="http://example.com/a/">http://example.com/a/</a>"' in page
+    assert 'http://x.y/</a>' not in page
+    # Not a url as a whole, because of the quotes
+    assert 'href="https://example.com/?a=1' not in page
+
+
+def test_urls_on_one_line_stay_separate():
+    page = render_html(['http://a.example/', 'http://b.example/'])
+    assert page.count('<a href=') == 2
+
+
+def test_max_size():
+    data = [{'id': ix} for ix in range(1000)]
+    assert render_html(data, max_size=1000) is None
+    assert render_html(data, max_size=10 ** 6) is not None
+
+
+def test_max_size_stops_walking_the_data():
+    consumed = []
+
+    def items():
+        for ix in range(10 ** 6):
+            consumed.append(ix)
+            yield {'id': ix}
+
+    assert render_html(items(), max_size=1000) is None
+    assert len(consumed) < 100
+
+
+def test_iter_html_and_create_html():
+    data = {'a': [1, 2]}
+    assert ''.join(iter_html(data)) == render_html(data)
+    assert create_html(json.dumps(data)) == render_html(data)
+
+
+def test_view_renders_html(html_media_type):
+    response = Client().get('/data/', HTTP_ACCEPT='text/html')
+    assert response['Content-Type'].startswith('text/html')
+    assert '&quot;' not in response.content.decode('utf-8')
+    assert '"name": "Persön"' in response.content.decode('utf-8')
+
+
+@override_settings(RESTUTILS_HTML_MAX_SIZE=1000)
+def test_view_falls_back_to_json_for_large_pages(html_media_type):
+    response = Client().get('/stream/?size=1000', HTTP_ACCEPT='text/html')
+    assert response['Content-Type'].startswith('application/json')
+    content = b''.join(response.streaming_content) if response.streaming \
+        else response.content
+    assert json.loads(content) == [{'id': ix} for ix in range(1000)]
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from django.test import Client, RequestFactory, override_settings
+
+from restutils.hal import Representation
+from restutils.lib.json_encoding import (encode, decode, encoders,
+                                         get_encoder, pretty_dumps)
+
+
+@pytest.mark.parametrize('encoder', list(encoders))
+def test_encode_returns_compact_utf8_bytes(encoder):
+    content = encode({'name': 'Persön', 'items': [1, 2]}, encoder=encoder)
+    assert isinstance(content, bytes)
+    assert content == '{"name":"Persön","items":[1,2]}'.encode('utf-8')
+
+
+def test_pretty_dumps_is_indented():
+    assert pretty_dumps({'a': 1}) == b'{\n    "a": 1\n}'
+
+
+def test_encode_with_callable():
+    assert encode({'a': 1}, encoder=lambda data: b'custom') == b'custom'
+
+
+def test_unknown_encoder():
+    with pytest.raises(ValueError):
+        get_encoder('nonexistent')
+
+
+def test_encoder_setting():
+    with override_settings(RESTUTILS_JSON_ENCODER='json'):
+        assert get_encoder() is encoders['json']
+
+
+def test_decode_bytes():
+    assert decode('{"name":"Persön"}'.encode('utf-8')) == {'name': 'Persön'}
+    with pytest.raises(ValueError):
+        decode(b'{')
+
+
+def test_representation_to_json_returns_bytes():
+    doc = Representation(RequestFactory().get('/'))
+    doc.add_property('name', 'Persön')
+    content = doc.to_json()
+    assert isinstance(content, bytes)
+    assert json.loads(content) == {'name': 'Persön'}
+
+
+def test_json_view_response_is_compact():
+    response = Client().get('/data/')
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/json; charset=utf-8'
+    assert response.content == (
+        '{"name":"Persön","items":[1,2,3]}'.encode('utf-8'))
+
+
+def test_json_view_with_encoder():
+    response = Client().get('/json-encoder/')
+    assert json.loads(response.content) == {'name': 'Persön'}
+
+
+def test_json_view_representation_content_type():
+    response = Client().get('/representation/',
+                            HTTP_ACCEPT='application/hal+json')
+    assert response['Content-Type'] == 'application/hal+json; charset=utf-8'
+    assert json.loads(response.content) == {
+        'name': 'Persön',
+        '_links': {'self': {'href': 'http://testserver/representation/',
+                            'title': 'URI of this resource'}},
+    }
@@ -0,0 +1,59 @@
+import pytest
+
+from django.test import RequestFactory
+from django.urls import NoReverseMatch, resolve, set_urlconf
+from django.utils import translation
+
+from restutils.magicreverse import MagicReverser, reverse_path
+
+
+def reverser(path):
+    request = RequestFactory().get(path)
+    request.resolver_match = resolve(path)
+    return MagicReverser(request)
+
+
+def test_rev_fills_in_the_kwargs_of_the_current_url():
+    rev = reverser('/persons/12/').rev
+    assert (rev('person-profile', profile_id=34) ==
+            'http://testserver/persons/12/profiles/34/')
+    assert (rev('person-item', person_id=5) ==
+            'http://testserver/persons/5/')
+
+
+def test_rev_resolves_lazily():
+    request = RequestFactory().get('/persons/12/')
+    reverser = MagicReverser(request)
+    assert reverser._kwargs is None
+    assert (reverser.rev('person-item') ==
+            'http://testserver/persons/12/')
+
+
+def test_rev_unknown_route():
+    with pytest.raises(NoReverseMatch):
+        reverser('/persons/12/').rev('nonexistent')
+
+
+def test_reverse_path_depends_on_the_urlconf():
+    assert reverse_path('person-item', {'person_id': 1}) == '/persons/1/'
+    set_urlconf('tests.urls_alternate')
+    try:
+        with translation.override('en'):
+            assert (reverse_path('person-item', {'person_id': 1}) ==
+                    '/en/people/1/')
+    finally:
+        set_urlconf(None)
+    assert reverse_path('person-item', {'person_id': 1}) == '/persons/1/'
+
+
+def test_reverse_path_depends_on_the_language():
+    set_urlconf('tests.urls_alternate')
+    try:
+        with translation.override('en'):
+            assert (reverse_path('person-item', {'person_id': 1}) ==
+                    '/en/people/1/')
+        with translation.override('nl'):
+            assert (reverse_path('person-item', {'person_id': 1}) ==
+                    '/nl/people/1/')
+    finally:
+        set_urlconf(None)
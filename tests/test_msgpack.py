@@ -0,0 +1,108 @@
+import datetime
+import json
+from zoneinfo import ZoneInfo
+
+import pytest
+from django.test import Client, override_settings
+
+msgpack = pytest.importorskip('msgpack')
+
+from restutils.lib.content_negotiation import best_content_type
+from restutils.lib.json_encoding import encode
+from restutils.lib.msgpack_encoding import dumps
+from restutils.middleware import RequestDataMiddleware
+
+from tests.test_response_cache import empty_cache
+
+HAL = 'application/hal+json; charset=utf-8'
+JSON = 'application/json; charset=utf-8'
+HAL_MSGPACK = 'application/hal+msgpack'
+MSGPACK = 'application/msgpack'
+
+MIXED = 'application/hal+json, application/msgpack;q=0.5'
+
+
+@pytest.mark.parametrize('optimal, accept, expected', [
+    ('hal+json', 'application/hal+msgpack', HAL_MSGPACK),
+    ('hal+json', 'application/msgpack', MSGPACK),
+    ('hal+json', '*/*', JSON),
+    ('hal+json', 'application/*', JSON),
+    ('hal+json', 'application/hal+msgpack, application/json;q=0.5',
+     HAL_MSGPACK),
+    ('json', 'application/msgpack', MSGPACK),
+    ('json', '*/*', JSON),
+    # Plain data is not HAL, and JSON never falls back to a binary type
+    ('json', 'application/hal+msgpack', JSON),
+    ('json', 'application/hal+json', JSON),
+    ('json', MIXED, MSGPACK),
+    ('hal+json', MIXED, HAL),
+    ('vnd.error', 'application/hal+msgpack', HAL_MSGPACK),
+])
+def test_negotiation(optimal, accept, expected):
+    assert best_content_type(optimal, accept) == expected
+
+
+def test_representation_as_msgpack():
+    response = Client().get('/representation/', HTTP_ACCEPT=HAL_MSGPACK)
+    assert response['Content-Type'] == HAL_MSGPACK
+    data = msgpack.unpackb(response.content)
+    assert data == json.loads(Client().get('/representation/').content)
+
+
+def test_stream_as_msgpack():
+    response = Client().get('/stream/?size=3', HTTP_ACCEPT=MSGPACK)
+    assert not response.streaming
+    assert msgpack.unpackb(response.content) == [{'id': ix}
+                                                 for ix in range(3)]
+
+
+def test_error_as_msgpack():
+    response = Client().get('/error/', HTTP_ACCEPT=HAL_MSGPACK)
+    assert response.status_code == 404
+    assert response['Content-Type'] == HAL_MSGPACK
+    assert msgpack.unpackb(response.content)['logref'] == '42'
+
+
+def test_cache_keeps_variants_apart(empty_cache):
+    client = Client()
+    binary = client.get('/cached/', HTTP_ACCEPT=MIXED)
+    assert binary['Content-Type'] == MSGPACK
+    text = client.get('/cached/', HTTP_ACCEPT='application/hal+json')
+    assert text['Content-Type'] == JSON
+    calls = msgpack.unpackb(binary.content)['calls']
+    # A separate cache entry, so the view ran again
+    assert json.loads(text.content) == {'calls': calls + 1}
+    again = client.get('/cached/', HTTP_ACCEPT=MIXED)
+    assert msgpack.unpackb(again.content) == {'calls': calls}
+
+
+def test_etags_of_variants_differ():
+    client = Client()
+    binary = client.get('/etag-func/', HTTP_ACCEPT=MIXED)
+    text = client.get('/etag-func/', HTTP_ACCEPT='application/hal+json')
+    assert binary['Content-Type'] == MSGPACK
+    assert text['Content-Type'] == JSON
+    assert binary['ETag'] != text['ETag']
+    response = client.get('/etag-func/', HTTP_ACCEPT='application/hal+json',
+                          HTTP_IF_NONE_MATCH=binary['ETag'])
+    assert response.status_code == 200
+
+
+def test_msgpack_request_body(rf):
+    request = rf.post('/', msgpack.packb({'name': 'Persön'}),
+                      content_type='application/msgpack')
+    RequestDataMiddleware(lambda request: None).process_request(request)
+    assert request.data == {'name': 'Persön'}
+
+
+@pytest.mark.parametrize('date', [
+    datetime.datetime(2020, 1, 2, 3, 4, 5, 678,
+                      tzinfo=ZoneInfo('Europe/Amsterdam')),
+    datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=ZoneInfo('UTC')),
+    datetime.datetime(2020, 1, 2, 3, 4, 5),
+    datetime.date(2020, 1, 2),
+])
+def test_iso_dates_like_json(date):
+    with override_settings(RESTUTILS_JSON_ISO_DATES=True):
+        assert msgpack.unpackb(dumps({'at': date})) == json.loads(
+            encode({'at': date}))
@@ -0,0 +1,155 @@
+import base64
+import json
+
+import pytest
+
+from restutils.exceptions import BadRequest
+from restutils.hal import Representation
+from restutils.pagination import KeysetPaginator, _encode_cursor
+
+from restutils.serializers import ResourceSchema
+
+from tests.models import Person
+
+person_schema = ResourceSchema(fields=['name'], links={
+    'self': {'route': 'person-item', 'kwargs': {'person_id': 'pk'}}})
+
+
+def person_representation(person):
+    doc = Representation(None)
+    doc.add_property('id', person.id)
+    doc.add_property('name', person.name)
+    return doc
+
+
+def raw_cursor(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode(
+        'ascii').rstrip('=')
+
+
+def ids(page):
+    return [person.id for person in page.items]
+
+
+def cursor_of(link):
+    return link.split('cursor=')[1].split('&')[0]
+
+
+def test_pages_forward_and_backward(rf, persons):
+    paginator = KeysetPaginator(page_size=4)
+    all_ids = [person.id for person in persons]
+    queryset = Person.objects.all()
+
+    page = paginator.paginate(rf.get('/persons/'), queryset)
+    assert ids(page) == all_ids[:4]
+    assert page.previous_cursor is None
+
+    page = paginator.paginate(
+        rf.get('/persons/', {'cursor': page.next_cursor}), queryset)
+    assert ids(page) == all_ids[4:8]
+
+    last = paginator.paginate(
+        rf.get('/persons/', {'cursor': page.next_cursor}), queryset)
+    assert ids(last) == all_ids[8:]
+    assert last.next_cursor is None
+
+    page = paginator.paginate(
+        rf.get('/persons/', {'cursor': last.previous_cursor}), queryset)
+    assert ids(page) == all_ids[4:8]
+
+
+def test_ordering_with_ties_and_descending(rf, persons):
+    paginator = KeysetPaginator(ordering=('-age',), page_size=3)
+    queryset = Person.objects.all()
+    expected = [person.id for person in
+                Person.objects.order_by('-age', 'pk')]
+    seen = []
+    request = rf.get('/persons/')
+    while True:
+        page = paginator.paginate(request, queryset)
+        seen.extend(ids(page))
+        if page.next_cursor is None:
+            break
+        request = rf.get('/persons/', {'cursor': page.next_cursor})
+    assert seen == expected
+
+
+def test_page_size_param_and_count(rf, persons):
+    paginator = KeysetPaginator(page_size=4, max_page_size=5, with_count=True,
+                                with_last=True)
+    page = paginator.paginate(rf.get('/persons/', {'page_size': '50'}),
+                              Person.objects.all())
+    assert len(page.items) == 5
+    assert page.count == 10
+    last = paginator.paginate(rf.get('/persons/', {'cursor':
+                                                   page.last_cursor}),
+                              Person.objects.all())
+    assert ids(last) == [person.id for person in persons[6:]]
+
+
+def test_links(rf, persons):
+    paginator = KeysetPaginator(page_size=4)
+    request = rf.get('/persons/', {'filter': 'x'})
+    page = paginator.paginate(request, Person.objects.all())
+    doc = Representation(request)
+    page.add_to(doc, 'persons', person_representation)
+    data = doc.to_dict()
+    assert data['_links']['first']['href'] == (
+        'http://testserver/persons/?filter=x')
+    assert 'previous' not in data['_links']
+    assert data['_links']['next']['href'].startswith(
+        'http://testserver/persons/?filter=x&cursor=')
+    assert data['_embedded']['persons'] == [
+        {'id': person.id, 'name': person.name} for person in persons[:4]]
+
+
+def test_add_to_with_a_schema(rf, persons):
+    request = rf.get('/persons/')
+    page = KeysetPaginator(page_size=2).paginate(
+        request, Person.objects.values('pk', 'name'))
+    doc = Representation(request)
+    page.add_to(doc, 'persons', person_schema)
+    assert doc.to_dict()['_embedded']['persons'] == [
+        {'_links': {'self': {'href': 'http://testserver/persons/%d/' %
+                             person.id, 'title': 'URI of this resource'}},
+         'name': person.name} for person in persons[:2]]
+
+
+@pytest.mark.parametrize('values', [(), ('pk', 'age'), ('id', 'age')])
+def test_values_rows(rf, persons, values):
+    paginator = KeysetPaginator(ordering=('-age',), page_size=3)
+    queryset = Person.objects.values(*values)
+    expected = [person.id for person in
+                Person.objects.order_by('-age', 'pk')]
+    seen = []
+    request = rf.get('/persons/')
+    while True:
+        page = paginator.paginate(request, queryset)
+        seen.extend(row.get('pk', row.get('id')) for row in page.items)
+        if page.next_cursor is None:
+            break
+        request = rf.get('/persons/', {'cursor': page.next_cursor})
+    assert seen == expected
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64!',
+    raw_cursor(5),
+    raw_cursor(None),
+    raw_cursor('x'),
+    raw_cursor([]),
+    raw_cursor(['n']),
+    raw_cursor(['x', [1]]),
+    raw_cursor(['n', 5]),
+    raw_cursor(['n', [1, 2]]),
+    raw_cursor(['n', [[1]]]),
+    raw_cursor(['n', [{'a': 1}]]),
+    raw_cursor(['n', [None]]),
+    raw_cursor(['n', ['not a number']]),
+    _encode_cursor('n', ['x']),
+])
+def test_invalid_cursors_are_bad_requests(rf, persons, cursor):
+    with pytest.raises(BadRequest) as error:
+        KeysetPaginator().paginate(rf.get('/persons/', {'cursor': cursor}),
+                                   Person.objects.all())
+    assert error.value.message == "Invalid cursor"
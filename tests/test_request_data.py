@@ -0,0 +1,132 @@
+import json
+from io import BytesIO
+
+import pytest
+
+from django.http import HttpRequest
+from django.test import Client, override_settings
+
+from restutils.exceptions import BadRequest, PayloadTooLarge
+from restutils.middleware import RequestDataMiddleware
+from restutils.utils import decode_json_data
+from restutils.validation import Array, BodySchema, Integer
+
+
+def streamed_request(body, content_length=None):
+    # Like a chunked request, which has no Content-Length
+    request = HttpRequest()
+    request.method = 'POST'
+    request._stream = BytesIO(body)
+    request._read_started = False
+    if content_length is not None:
+        request.META['CONTENT_LENGTH'] = str(content_length)
+    return request
+
+
+def test_decode_json_data(rf):
+    request = rf.post('/', '{"name":"Persön"}', content_type='application/json')
+    assert decode_json_data(request) == {'name': 'Persön'}
+
+
+def test_decode_invalid_json(rf):
+    request = rf.post('/', '{', content_type='application/json')
+    with pytest.raises(BadRequest):
+        decode_json_data(request)
+
+
+def test_content_length_over_the_limit(rf):
+    request = rf.post('/', '[' + '1,' * 100 + '1]',
+                      content_type='application/json')
+    with pytest.raises(PayloadTooLarge):
+        decode_json_data(request, max_size=100)
+    with override_settings(RESTUTILS_MAX_BODY_SIZE=100):
+        with pytest.raises(PayloadTooLarge):
+            decode_json_data(request)
+
+
+def test_body_without_content_length_over_the_limit():
+    request = streamed_request(b'[' + b'1,' * 100 + b'1]')
+    with pytest.raises(PayloadTooLarge):
+        decode_json_data(request, max_size=100)
+    # No more than one byte over the limit was read
+    assert request._stream.tell() == 101
+
+
+def test_body_with_wrong_content_length_over_the_limit():
+    request = streamed_request(b'[' + b'1,' * 100 + b'1]', content_length=10)
+    with pytest.raises(PayloadTooLarge):
+        decode_json_data(request, max_size=100)
+
+
+def test_body_within_the_limit_stays_readable():
+    request = streamed_request(b'[1,2,3]')
+    assert decode_json_data(request, max_size=7) == [1, 2, 3]
+    assert request.body == b'[1,2,3]'
+
+
+def test_body_that_was_already_read(rf):
+    request = rf.post('/', '[1,2,3]', content_type='application/json')
+    assert request.body == b'[1,2,3]'
+    assert decode_json_data(request, max_size=100) == [1, 2, 3]
+    with pytest.raises(PayloadTooLarge):
+        decode_json_data(request, max_size=5)
+
+
+def test_request_data_is_lazy_and_per_request(rf):
+    middleware = RequestDataMiddleware(lambda request: None)
+    request = rf.patch('/', '{"a": 1}', content_type='application/json')
+    request_class = type(request)
+    middleware.process_request(request)
+    assert type(request) is request_class
+    assert '_data_dict' not in request.__dict__
+    assert type(request.data) is dict
+    assert request.data == {'a': 1}
+    assert request.data is request.data
+    assert not hasattr(rf.get('/'), 'data')
+    assert not hasattr(rf.post('/', '{}', content_type='application/json'),
+                       'data')
+
+
+def test_request_data_is_the_parsed_value(rf):
+    middleware = RequestDataMiddleware(lambda request: None)
+    request = rf.post('/', 'null', content_type='application/json')
+    middleware.process_request(request)
+    assert request.data is None
+    request = rf.post('/', '[1]', content_type='application/json')
+    middleware.process_request(request)
+    assert type(request.data) is list
+    assert BodySchema(Array(Integer())).validate(request.data) == [1]
+
+
+def test_request_data_only_for_writes(rf):
+    middleware = RequestDataMiddleware(lambda request: None)
+    request = rf.get('/')
+    middleware.process_request(request)
+    assert not hasattr(request, 'data')
+
+
+def test_invalid_request_data_raises_when_used(rf):
+    middleware = RequestDataMiddleware(lambda request: None)
+    request = rf.post('/', '{', content_type='application/json')
+    middleware.process_request(request)
+    with pytest.raises(BadRequest):
+        request.data['a']
+
+
+def test_echo_request_data():
+    body = {'name': 'Persön', 'tags': ['a']}
+    response = Client().post('/echo/', json.dumps(body),
+                             content_type='application/json')
+    assert response.status_code == 200
+    assert json.loads(response.content) == body
+
+
+def test_validate_request_data():
+    response = Client().post('/validated/', json.dumps({'name': 'Mary'}),
+                             content_type='application/json')
+    assert json.loads(response.content) == {'name': 'Mary'}
+    response = Client().post('/validated/', json.dumps({'name': 5}),
+                             content_type='application/json')
+    assert response.status_code == 400
+    assert json.loads(response.content)['_embedded']['errors'] == [
+        {'message': "Expected a string", 'path': '/name'}]
@@ -0,0 +1,111 @@
+import json
+import threading
+import time
+
+import pytest
+
+from django.test import Client
+
+from restutils.decorators import json_view
+from restutils.lib.response_cache import (LocalCache, ResponseCache,
+                                          invalidate_route)
+
+from tests.urls import response_cache, view_calls
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    invalidate_route('cached')
+
+
+def test_cache_hit_skips_the_view():
+    client = Client()
+    first = client.get('/cached/')
+    second = client.get('/cached/')
+    assert json.loads(second.content) == json.loads(first.content)
+    assert second['Content-Type'] == first['Content-Type']
+
+
+def test_cache_key_includes_the_query_string():
+    client = Client()
+    first = json.loads(client.get('/cached/?a=1').content)
+    second = json.loads(client.get('/cached/?a=2').content)
+    assert first != second
+
+
+def test_invalidate_route():
+    client = Client()
+    first = json.loads(client.get('/cached/').content)
+    invalidate_route('cached')
+    assert json.loads(client.get('/cached/').content) != first
+
+
+def test_errors_are_not_cached():
+    client = Client()
+    calls = view_calls['cached']
+    client.get('/cached/?fail=1')
+    client.get('/cached/?fail=1')
+    assert view_calls['cached'] == calls + 2
+
+
+def test_cache_true():
+    assert Client().get('/cache-true/').status_code == 200
+
+
+@pytest.mark.parametrize('cache, timeout', [
+    (True, 60), (30, 30), (2.5, 2.5),
+])
+def test_cache_timeouts(monkeypatch, cache, timeout):
+    created = []
+    original = ResponseCache.__init__
+
+    def init(self, *args, **kwargs):
+        original(self, *args, **kwargs)
+        created.append(self)
+
+    monkeypatch.setattr(ResponseCache, '__init__', init)
+    json_view(cache=cache)(lambda request: {})
+    assert [response_cache.timeout for response_cache in created] == [timeout]
+
+
+def test_cache_false_disables_caching(monkeypatch):
+    monkeypatch.setattr(ResponseCache, '__init__', None)
+    json_view(cache=False)(lambda request: {})
+
+
+def test_local_cache_expires_and_evicts():
+    cache = LocalCache(max_entries=2)
+    cache.set('a', 1, timeout=-1)
+    assert cache.get('a') is None
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    cache.delete('a')
+    assert cache.get('a', 'missing') == 'missing'
+
+
+def test_single_flight(rf):
+    cache = ResponseCache()
+    calls = []
+    started = threading.Event()
+
+    def render():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return json_view(lambda request: {'a': 1})(request)
+
+    request = rf.get('/x/')
+    results = []
+    threads = [threading.Thread(
+        target=lambda: results.append(cache.get_response(request, 'v', render)))
+        for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert [response.content for response in results] == [b'{"a":1}'] * 4
@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+
+from django.http import HttpResponse
+from django.test import Client
+
+from restutils.router import (DispatchTable, RoutableResourceMixin, Route,
+                              current_request)
+
+
+def test_dispatch_table_is_immutable():
+    table = DispatchTable({'GET': lambda request: HttpResponse(b'')})
+    assert table.methods == ('OPTIONS', 'GET')
+    with pytest.raises(TypeError):
+        table.handlers['PUT'] = lambda request: None
+
+
+def test_route_compiles_once_and_recompiles_on_change():
+    route = Route()
+    route.add_handler('GET', lambda request: HttpResponse(b''))
+    table = route.compile()
+    assert route.compile() is table
+    route.add_handler('PUT', lambda request: HttpResponse(b''))
+    assert route.compile() is not table
+    assert route.compile().allow == 'OPTIONS, GET, HEAD, PUT'
+
+
+def test_options_and_not_allowed(rf):
+    route = Route()
+    route.add_handler('GET', lambda request: HttpResponse(b'get'))
+    response = route.dispatch(rf.options('/'))
+    assert response['Allow'] == 'OPTIONS, GET, HEAD'
+    response = route.dispatch(rf.delete('/'))
+    assert response.status_code == 405
+    assert route.dispatch(rf.head('/')).content == b'get'
+
+
+def test_current_request_during_dispatch(rf):
+    seen = []
+    route = Route()
+    route.add_handler('GET', lambda request: seen.append(
+        current_request()) or HttpResponse(b''))
+    request = rf.get('/')
+    route.dispatch(request)
+    assert seen == [request]
+    assert current_request() is None
+
+
+def test_resource_request_is_per_thread(rf):
+    resource = RoutableResourceMixin()
+    with pytest.raises(AttributeError):
+        resource.request
+    seen = {}
+
+    def handle(name):
+        request = rf.get('/' + name + '/')
+        resource._set_request(request)
+        barrier.wait()
+        seen[name] = resource.request is request
+
+    barrier = threading.Barrier(2)
+    threads = [threading.Thread(target=handle, args=(name,))
+               for name in ('a', 'b')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert seen == {'a': True, 'b': True}
+
+
+def test_resource_urls():
+    client = Client()
+    assert client.get('/resources/5/').content == b'async 5'
+    assert client.put('/resources/5/').content == b'sync PUT'
+    assert client.delete('/resources/5/').status_code == 405
@@ -0,0 +1,119 @@
+import json
+from types import SimpleNamespace
+
+from django.urls import set_urlconf
+from django.utils import translation
+
+from restutils.hal import Representation
+from restutils.serializers import ResourceSchema
+
+person_schema = ResourceSchema(
+    fields=['id', 'name', ('initial', lambda person: person_name(person)[0])],
+    links={
+        'self': {'route': 'person-item', 'kwargs': {'person_id': 'id'}},
+        'cr:profile': {'route': 'person-profile',
+                       'kwargs': {'person_id': 'id',
+                                  'profile_id': 'profile_id'},
+                       'title': 'Profile'},
+    },
+    curies={'cr': '/docs/{rel}.html', 'unused': '/unused/{rel}'})
+
+
+def person_name(person):
+    return person['name'] if isinstance(person, dict) else person.name
+
+
+def person(ix):
+    return SimpleNamespace(id=ix, name='Persön %d' % ix, profile_id=ix * 10)
+
+
+def row(ix):
+    return vars(person(ix))
+
+
+def expected_item(ix):
+    return {
+        '_links': {
+            'self': {'href': 'http://testserver/persons/%d/' % ix,
+                     'title': 'URI of this resource'},
+            'cr:profile': {
+                'href': 'http://testserver/persons/%d/profiles/%d/' % (
+                    ix, ix * 10),
+                'title': 'Profile'},
+        },
+        'id': ix,
+        'name': 'Persön %d' % ix,
+        'initial': 'P',
+    }
+
+
+def test_items_and_curies(rf):
+    doc = Representation(rf.get('/'))
+    person_schema.add_object_list(doc, 'cr:persons',
+                                  [person(1), person(2)])
+    data = doc.to_dict()
+    assert data['_links']['curies'] == [
+        {'name': 'cr', 'href': 'http://testserver/docs/{rel}.html',
+         'templated': True, 'title': 'Compact URI for namespacing'}]
+    assert data['_embedded']['cr:persons'] == [expected_item(1),
+                                               expected_item(2)]
+    assert json.loads(doc.to_json()) == data
+
+
+def test_dicts_and_objects_are_equal(rf):
+    serializer = person_schema.compile(rf.get('/'))
+    assert serializer.to_dict(person(3)) == serializer.to_dict(row(3))
+    assert json.loads(serializer.to_json(row(3))) == expected_item(3)
+
+
+def test_routes_without_kwargs(rf):
+    schema = ResourceSchema(fields=[], links={
+        'self': {'route': 'cached'}})
+    assert schema.compile(rf.get('/')).to_dict({}) == {'_links': {'self': {
+        'href': 'http://testserver/cached/',
+        'title': 'URI of this resource'}}}
+
+
+def test_fields_parameter(rf):
+    serializer = person_schema.compile(rf.get('/', {'fields': 'name'}))
+    data = serializer.to_dict(person(1))
+    assert set(data) == {'_links', 'name'}
+
+
+def test_iterators_stream_and_callables_are_deferred(rf):
+    calls = []
+
+    def items():
+        calls.append(True)
+        return [row(1)]
+
+    doc = Representation(rf.get('/'))
+    person_schema.add_object_list(doc, 'streamed', iter([row(2)]))
+    person_schema.add_object_list(doc, 'deferred', items)
+    assert doc.is_streaming()
+    assert calls == []
+    data = json.loads(b''.join(doc.iter_json()))
+    assert calls == [True]
+    assert data['_embedded']['streamed'] == [expected_item(2)]
+    assert data['_embedded']['deferred'] == [expected_item(1)]
+
+
+def test_templates_depend_on_the_urlconf_and_language(rf):
+    schema = ResourceSchema(fields=['id'], links={
+        'self': {'route': 'person-item', 'kwargs': {'person_id': 'id'}}})
+    request = rf.get('/')
+
+    def href():
+        return schema.compile(request).to_dict({'id': 1})['_links'][
+            'self']['href']
+
+    assert href() == 'http://testserver/persons/1/'
+    set_urlconf('tests.urls_alternate')
+    try:
+        with translation.override('en'):
+            assert href() == 'http://testserver/en/people/1/'
+        with translation.override('nl'):
+            assert href() == 'http://testserver/nl/people/1/'
+    finally:
+        set_urlconf(None)
+    assert href() == 'http://testserver/persons/1/'
@@ -0,0 +1,128 @@
+import asyncio
+import json
+
+import pytest
+from django.test import Client
+
+from restutils.hal import Representation
+
+
+def calls_of(calls, name, value):
+    def producer():
+        calls.append(name)
+        return value
+    return producer
+
+
+def item(request, ix):
+    item = Representation(request)
+    item.add_property('id', ix)
+    item.add_property('name', 'Item %d' % ix)
+    return item
+
+
+def test_callable_properties_are_computed_once(rf):
+    calls = []
+    doc = Representation(rf.get('/'))
+    doc.add_property('name', calls_of(calls, 'name', 'Persön'))
+    assert calls == []
+    assert doc.to_dict() == {'name': 'Persön'}
+    assert json.loads(doc.to_json()) == {'name': 'Persön'}
+    assert calls == ['name']
+
+
+def test_deferred_embedded_objects(rf):
+    request = rf.get('/')
+    calls = []
+    doc = Representation(request)
+    doc.add_object('first', calls_of(calls, 'first', item(request, 0)))
+    doc.add_object_list('items', calls_of(
+        calls, 'items', [item(request, ix) for ix in range(2)]))
+    assert doc.count_embedded() == 0
+    data = doc.to_dict()
+    assert sorted(calls) == ['first', 'items']
+    assert list(data['_embedded']) == ['first', 'items']
+    assert [i['id'] for i in data['_embedded']['items']] == [0, 1]
+
+
+def test_fields_select_properties(rf):
+    calls = []
+    doc = Representation(rf.get('/', {'fields': 'id,other'}))
+    doc.add_link('self', '/persons/1/')
+    doc.add_property('id', 1)
+    doc.add_property('name', calls_of(calls, 'name', 'Persön'))
+    data = doc.to_dict()
+    assert data['id'] == 1
+    assert 'name' not in data
+    # Links are always there
+    assert data['_links']['self']['href'] == 'http://testserver/persons/1/'
+    assert json.loads(b''.join(doc.iter_json())) == data
+    assert calls == []
+
+
+def test_fields_apply_to_embedded_objects(rf):
+    request = rf.get('/', {'fields': 'name'})
+    doc = Representation(request)
+    doc.add_property('count', 2)
+    doc.add_object_list('items', [item(request, ix) for ix in range(2)])
+    data = doc.to_dict()
+    assert 'count' not in data
+    assert data['_embedded']['items'] == [{'name': 'Item 0'},
+                                          {'name': 'Item 1'}]
+
+
+def test_embed_selects_relations(rf):
+    request = rf.get('/', {'embed': 'items'})
+    calls = []
+    doc = Representation(request)
+    doc.add_property('count', 1)
+    doc.add_object('first', calls_of(calls, 'first', item(request, 0)))
+    doc.add_object_list('items', calls_of(calls, 'items',
+                                          [item(request, 1)]))
+    data = doc.to_dict()
+    assert data['count'] == 1
+    assert list(data['_embedded']) == ['items']
+    assert calls == ['items']
+
+
+def test_empty_embed_leaves_out_embedded(rf):
+    doc = Representation(rf.get('/', {'embed': ''}))
+    doc.add_object('first', item(doc.request, 0))
+    assert '_embedded' not in doc.to_dict()
+
+
+def test_views_honor_fields():
+    response = Client().get('/representation/?fields=other')
+    data = json.loads(response.content)
+    assert 'name' not in data
+    assert '_links' in data
+
+
+@pytest.mark.parametrize('query', ['?fields=id', '?embed=items',
+                                   '?fields=&embed='])
+def test_error_bodies_ignore_fields(query):
+    response = Client().get('/error/' + query)
+    assert response.status_code == 404
+    data = json.loads(response.content)
+    assert data['message'] == 'No such thing'
+    assert data['logref'] == '42'
+
+
+def test_aresolve_produces_requested_relations(rf):
+    request = rf.get('/', {'embed': 'items,first'})
+    calls = []
+
+    async def first():
+        calls.append('first')
+        return item(request, 0)
+
+    doc = Representation(request)
+    doc.add_object('first', first)
+    doc.add_object_list('items', calls_of(calls, 'items',
+                                          [item(request, 1)]))
+    doc.add_object('other', calls_of(calls, 'other', item(request, 2)))
+    asyncio.run(doc.aresolve())
+    assert sorted(calls) == ['first', 'items']
+    data = doc.to_dict()
+    assert list(data['_embedded']) == ['first', 'items']
+    assert data['_embedded']['first']['id'] == 0
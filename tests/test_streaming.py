@@ -0,0 +1,57 @@
+import json
+
+from django.test import Client, RequestFactory
+
+from restutils.hal import Representation
+from restutils.lib.json_encoding import buffered, iter_encode_list
+
+from tests.urls import item_representation
+
+
+def test_iter_encode_list():
+    assert b''.join(iter_encode_list(iter([1, {'a': 2}]))) == b'[1,{"a":2}]'
+    assert b''.join(iter_encode_list(iter([]))) == b'[]'
+
+
+def test_buffered_joins_small_chunks():
+    chunks = list(buffered([b'a'] * 10, size=4))
+    assert chunks == [b'aaaa', b'aaaa', b'aa']
+
+
+def test_iterator_view_streams_a_json_array():
+    response = Client().get('/stream/?size=5')
+    assert response.streaming
+    assert response['Content-Type'] == 'application/json; charset=utf-8'
+    content = b''.join(response.streaming_content)
+    assert json.loads(content) == [{'id': ix} for ix in range(5)]
+
+
+def test_empty_iterator_view():
+    response = Client().get('/stream/?size=0')
+    assert b''.join(response.streaming_content) == b'[]'
+
+
+def test_representation_with_iterator_streams():
+    response = Client().get('/stream-representation/',
+                            HTTP_ACCEPT='application/hal+json')
+    assert response.streaming
+    data = json.loads(b''.join(response.streaming_content))
+    assert data['count'] == 3
+    assert [item['id'] for item in data['_embedded']['items']] == [0, 1, 2]
+    # The curies of the streamed items are hoisted to the document
+    assert data['_links']['curies'][0]['name'] == 'it'
+    assert 'curies' not in data['_embedded']['items'][0]['_links']
+
+
+def test_iter_json_matches_to_dict():
+    request = RequestFactory().get('/')
+
+    def build():
+        doc = Representation(request)
+        doc.add_link('self', '/')
+        doc.add_object_list('items', (item_representation(request, ix)
+                                      for ix in range(3)))
+        return doc
+
+    streamed = json.loads(b''.join(build().iter_json()))
+    assert streamed == build().to_dict()
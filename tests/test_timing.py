@@ -0,0 +1,80 @@
+import pytest
+from django.test import Client, override_settings
+
+from restutils.hal import Representation
+from restutils.lib.timing import request_timed
+
+from tests.urls import item_representation
+
+
+@pytest.fixture
+def timed():
+    calls = []
+
+    def record(sender, request, response, timings, metrics, **kwargs):
+        calls.append((timings, metrics))
+
+    request_timed.connect(record)
+    yield calls
+    request_timed.disconnect(record)
+
+
+def phases(response):
+    return [part.split(';')[0] for part in
+            response['Server-Timing'].split(', ')]
+
+
+def test_disabled_by_default(timed):
+    response = Client().get('/representation/')
+    assert not response.has_header('Server-Timing')
+    assert timed == []
+
+
+@override_settings(RESTUTILS_TIMING=True)
+def test_json_view_phases(timed):
+    response = Client().get('/representation/',
+                            HTTP_ACCEPT='application/hal+json')
+    assert phases(response) == ['view', 'negotiate', 'encode', 'embedded',
+                                'size']
+    assert 'size;desc="%d"' % len(response.content) in \
+        response['Server-Timing']
+    [(timings, metrics)] = timed
+    assert set(timings) == {'view', 'negotiate', 'encode'}
+    assert all(duration >= 0 for duration in timings.values())
+    assert metrics == {'embedded': 0, 'size': len(response.content)}
+
+
+def test_embedded_count(rf):
+    doc = Representation(rf.get('/'))
+    doc.add_object_list('items', [item_representation(doc.request, ix)
+                                  for ix in range(3)])
+    doc.add_object('first', item_representation(doc.request, 0))
+    assert doc.count_embedded() == 4
+
+
+@override_settings(RESTUTILS_TIMING=True)
+def test_streamed_objects_are_not_counted(timed):
+    response = Client().get('/stream-representation/')
+    b''.join(response.streaming_content)
+    [(timings, metrics)] = timed
+    assert metrics['embedded'] == 0
+    # The size of a streamed body isn't known when it is reported
+    assert 'size' not in metrics
+
+
+@override_settings(RESTUTILS_TIMING=True)
+def test_error_response_is_timed(timed):
+    response = Client().get('/error/')
+    assert response.status_code == 404
+    assert 'error' in phases(response)
+    [(timings, metrics)] = timed
+    assert 'error' in timings
+
+
+@override_settings(RESTUTILS_TIMING=True)
+def test_route_dispatch_reports_once(timed):
+    response = Client().get('/resources/1/')
+    assert response.status_code == 200
+    assert 'dispatch' in phases(response)
+    assert len(timed) == 1
+    assert set(timed[0][0]) == {'dispatch'}
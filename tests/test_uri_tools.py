@@ -0,0 +1,32 @@
+from django.test import RequestFactory
+
+from restutils.lib.uri_tools import full_uri, uri_builder
+
+
+def test_full_uri_joins_absolute_paths_to_the_prefix():
+    request = RequestFactory().get('/persons/')
+    assert full_uri(request, '/persons/12/') == 'http://testserver/persons/12/'
+    assert full_uri(request, None) is None
+
+
+def test_full_uri_keeps_template_braces():
+    request = RequestFactory().get('/persons/')
+    assert (full_uri(request, '/docs/{rel}.html') ==
+            'http://testserver/docs/{rel}.html')
+
+
+def test_full_uri_falls_back_to_build_absolute_uri():
+    request = RequestFactory().get('/persons/')
+    assert full_uri(request, 'profile/') == 'http://testserver/persons/profile/'
+    assert full_uri(request, '/a/../b/') == 'http://testserver/b/'
+    assert full_uri(request, '/a b/') == 'http://testserver/a%20b/'
+    assert (full_uri(request, 'https://example.com/x/') ==
+            'https://example.com/x/')
+
+
+def test_prefix_is_computed_once_per_request():
+    request = RequestFactory().get('/', secure=True)
+    builder = uri_builder(request)
+    assert uri_builder(request) is builder
+    assert builder.prefix == 'https://testserver'
+    assert uri_builder(RequestFactory().get('/')) is not builder
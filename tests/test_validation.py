@@ -0,0 +1,119 @@
+import json
+
+import pytest
+
+from restutils.exceptions import ValidationFailed
+from restutils.middleware import VndErrorMiddleware
+from restutils.utils import decode_json_data
+from restutils.validation import (Array, BodySchema, Boolean, Integer, Number,
+                                  Object, String)
+
+person_schema = BodySchema({
+    'name': String(min_length=1, max_length=10),
+    'age': Integer(min_value=0, required=False),
+    'score': Number(max_value=10, required=False),
+    'active': Boolean(required=False),
+    'kind': String(choices=['a', 'b'], required=False),
+    'code': String(pattern=r'[A-Z]{3}', required=False),
+    'tags': Array(String(), max_items=3, required=False),
+    'address': Object({'city': String()}, nullable=True, required=False,
+                      allow_extra=False),
+})
+
+
+def problems(schema, data):
+    with pytest.raises(ValidationFailed) as error:
+        schema.validate(data)
+    return [(problem.path, problem.message) for problem in error.value.errors]
+
+
+def test_valid_data_is_returned():
+    data = {'name': 'Mary', 'age': 3, 'score': 9.5, 'active': True,
+            'kind': 'a', 'code': 'ABC', 'tags': ['x'], 'address': None,
+            'extra': 1}
+    assert person_schema.validate(data) is data
+
+
+def test_all_problems_with_pointers():
+    assert problems(person_schema, {
+        'age': -1, 'score': 11, 'active': 1, 'kind': 'c', 'code': 'abcd',
+        'tags': ['x', 2, 'y', 'z'], 'address': {'city': None, 'zip': '1'},
+    }) == [
+        ('/name', "This field is required"),
+        ('/age', "Less than 0"),
+        ('/score', "More than 10"),
+        ('/active', "Expected a boolean"),
+        ('/kind', "Not one of a, b"),
+        ('/code', "Doesn't match the pattern [A-Z]{3}"),
+        ('/tags', "More than 3 items"),
+        ('/tags/1', "Expected a string"),
+        ('/address/city', "May not be null"),
+        ('/address/zip', "Unknown field"),
+    ]
+
+
+@pytest.mark.parametrize('value, message', [
+    (True, "Expected an integer"),
+    (1.5, "Expected an integer"),
+    ('1', "Expected an integer"),
+])
+def test_integers(value, message):
+    assert problems(BodySchema(Integer()), value) == [('', message)]
+
+
+def test_numbers_are_not_booleans():
+    assert problems(BodySchema(Number()), True) == [('', "Expected a number")]
+    assert BodySchema(Number()).validate(1) == 1
+
+
+def test_lengths():
+    assert problems(person_schema, {'name': ''}) == [
+        ('/name', "Shorter than 1 characters")]
+    assert problems(person_schema, {'name': 'x' * 11}) == [
+        ('/name', "Longer than 10 characters")]
+
+
+def test_root_types():
+    assert problems(person_schema, []) == [('', "Expected an object")]
+    assert problems(person_schema, None) == [('', "May not be null")]
+    assert problems(BodySchema(Array(min_items=1)), []) == [
+        ('', "Fewer than 1 items")]
+    assert problems(BodySchema(Array()), {}) == [('', "Expected an array")]
+
+
+def test_pointers_are_escaped():
+    schema = BodySchema({'a/b': {'c~d': Integer()}})
+    assert problems(schema, {'a/b': {'c~d': 'x'}}) == [
+        ('/a~1b/c~0d', "Expected an integer")]
+
+
+def test_max_errors():
+    schema = BodySchema(Array(Integer()), max_errors=3)
+    assert [path for path, _ in problems(schema, ['x'] * 1000)] == [
+        '/0', '/1', '/2']
+
+
+def test_decode_json_data_validates(rf):
+    request = rf.post('/', '{"name": 5}', content_type='application/json')
+    with pytest.raises(ValidationFailed):
+        decode_json_data(request, schema=person_schema)
+    request = rf.post('/', '{"name": "Mary"}',
+                      content_type='application/json')
+    assert decode_json_data(request, schema=person_schema) == {'name': 'Mary'}
+
+
+def test_vnd_error_document(rf):
+    request = rf.post('/', HTTP_ACCEPT='application/vnd.error+json')
+    try:
+        person_schema.validate({'name': 5, 'tags': [1]})
+    except ValidationFailed as exception:
+        response = VndErrorMiddleware(lambda request: None).process_exception(
+            request, exception)
+    assert response.status_code == 400
+    data = json.loads(response.content)
+    assert data['message'] == "Invalid request body"
+    assert data['total'] == 2
+    assert data['_embedded']['errors'] == [
+        {'message': "Expected a string", 'path': '/name'},
+        {'message': "Expected a string", 'path': '/tags/0'},
+    ]
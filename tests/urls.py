@@ -0,0 +1,261 @@
+import asyncio
+import datetime
+import threading
+
+from django.http import HttpResponse
+from django.urls import include, path
+from django.utils.asyncio import async_unsafe
+
+from restutils.batch import BatchView
+from restutils.decorators import json_view
+from restutils.exceptions import NotFound
+from restutils.hal import Representation
+from restutils.router import RoutableResourceMixin
+from restutils.validation import BodySchema, String
+
+from tests.models import Person
+from restutils.lib.response_cache import ResponseCache
+
+
+@json_view
+def data_view(request):
+    return {'name': 'Persön', 'items': [1, 2, 3]}
+
+
+@json_view(encoder='json')
+def json_encoder_view(request):
+    return {'name': 'Persön'}
+
+
+@json_view
+def representation_view(request):
+    doc = Representation(request)
+    doc.add_link('self', '/representation/')
+    doc.add_property('name', 'Persön')
+    return doc
+
+
+@json_view
+def stream_view(request):
+    return ({'id': ix} for ix in range(int(request.GET.get('size', 3))))
+
+
+@json_view
+def stream_representation_view(request):
+    doc = Representation(request)
+    doc.add_link('self', '/stream-representation/')
+    doc.add_property('count', 3)
+    doc.add_object_list('items', (item_representation(request, ix)
+                                  for ix in range(3)))
+    return doc
+
+
+class ItemRepresentation(Representation):
+    curies = {'it': '/docs/{rel}.html'}
+
+
+def item_representation(request, ix):
+    item = ItemRepresentation(request)
+    item.add_link('it:detail', '/items/%d/' % ix)
+    item.add_property('id', ix)
+    return item
+
+
+versions = {'person': 1}
+view_calls = {'etag_func': 0}
+
+
+@json_view(etag=True)
+def etag_view(request):
+    return {'version': versions['person']}
+
+
+def get_modified(request):
+    return datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+
+
+@json_view(etag_func=lambda request: versions['person'],
+           last_modified_func=get_modified)
+def etag_func_view(request):
+    view_calls['etag_func'] += 1
+    return {'version': versions['person']}
+
+
+view_calls['cached'] = 0
+response_cache = ResponseCache(timeout=60)
+
+
+@json_view(cache=response_cache)
+def cached_view(request):
+    view_calls['cached'] += 1
+    if request.GET.get('fail'):
+        return {'failed': True}, 500
+    return {'calls': view_calls['cached']}
+
+
+@json_view(cache=True)
+def cache_true_view(request):
+    return {}
+
+
+@async_unsafe
+def sync_only_version(request):
+    # Like a database query, which raises SynchronousOnlyOperation when it is
+    # called from the event loop
+    return versions['person']
+
+
+@json_view(etag_func=sync_only_version)
+async def async_etag_view(request):
+    await asyncio.sleep(0)
+    return {'version': versions['person']}
+
+
+class SyncOnlyCache(object):
+    """A cache backend that can't be used from the event loop."""
+
+    def __init__(self):
+        self.entries = {}
+
+    @async_unsafe
+    def get(self, key, default=None):
+        return self.entries.get(key, default)
+
+    @async_unsafe
+    def set(self, key, value, timeout=None):
+        self.entries[key] = value
+
+
+view_calls['async_cached'] = 0
+
+
+@json_view(cache=ResponseCache(backend=SyncOnlyCache()))
+async def async_cached_view(request):
+    view_calls['async_cached'] += 1
+    return {'calls': view_calls['async_cached']}
+
+
+@json_view
+async def async_error_view(request):
+    raise NotFound("No such thing", logref='42')
+
+
+class PersonResource(RoutableResourceMixin):
+
+    async def show(self, request, person_id):
+        return HttpResponse(('async %s' % person_id).encode('utf-8'))
+
+    def update(self, request, person_id):
+        return HttpResponse(('sync %s' % self.request.method).encode('utf-8'))
+
+
+person_resource = PersonResource()
+
+
+@json_view(compress=True, etag=True)
+def compressed_view(request):
+    return {'items': list(range(int(request.GET.get('size', 500))))}
+
+
+@json_view(compress=True)
+def compressed_stream_view(request):
+    return ({'id': ix} for ix in range(500))
+
+
+@json_view(compress=False)
+def uncompressed_view(request):
+    return {'items': list(range(500))}
+
+
+@json_view
+def error_view(request):
+    raise NotFound(request.GET.get('message', "No such thing"), logref='42')
+
+
+@json_view
+def echo_view(request):
+    return request.data
+
+
+name_schema = BodySchema({'name': String()})
+
+
+@json_view
+def validated_view(request):
+    return name_schema.validate(request.data)
+
+
+@json_view
+async def async_lazy_view(request):
+    # The callables query the database, which is not allowed in the event
+    # loop
+    doc = Representation(request)
+    doc.add_property('count', lambda: Person.objects.count())
+    doc.add_object('first', lambda: item_representation(
+        request, Person.objects.order_by('pk').first().age))
+    doc.add_object_list('items', [person_representation(request, ix)
+                                  for ix in range(2)])
+    return doc
+
+
+def person_representation(request, ix):
+    doc = Representation(request)
+    doc.add_property('ix', ix)
+    doc.add_property('name', lambda: Person.objects.order_by('pk')[ix].name)
+    return doc
+
+
+@json_view
+def thread_view(request):
+    return {'thread': threading.get_ident()}
+
+
+view_calls['lazy_name'] = 0
+
+
+def lazy_name():
+    view_calls['lazy_name'] += 1
+    return 'Persön'
+
+
+@json_view
+def lazy_view(request):
+    doc = Representation(request)
+    doc.add_property('name', lazy_name)
+    return doc
+
+
+def empty_view(request, **kwargs):
+    return HttpResponse(b'')
+
+
+urlpatterns = [
+    path('data/', data_view),
+    path('json-encoder/', json_encoder_view),
+    path('representation/', representation_view),
+    path('stream/', stream_view),
+    path('stream-representation/', stream_representation_view),
+    path('etag/', etag_view),
+    path('etag-func/', etag_func_view),
+    path('cached/', cached_view, name='cached'),
+    path('cache-true/', cache_true_view),
+    path('async-etag/', async_etag_view),
+    path('async-cached/', async_cached_view),
+    path('async-error/', async_error_view),
+    path('resources/<int:person_id>/',
+         include(person_resource.item_urls('resource'))),
+    path('compressed/', compressed_view),
+    path('compressed-stream/', compressed_stream_view),
+    path('uncompressed/', uncompressed_view),
+    path('error/', error_view),
+    path('echo/', echo_view),
+    path('lazy/', lazy_view),
+    path('thread/', thread_view),
+    path('async-lazy/', async_lazy_view),
+    path('validated/', validated_view),
+    path('batch/', BatchView(max_operations=4, max_workers=2)),
+    path('batch-serial/', BatchView()),
+    path('persons/<int:person_id>/', empty_view, name='person-item'),
+    path('persons/<int:person_id>/profiles/<int:profile_id>/', empty_view,
+         name='person-profile'),
+]
@@ -0,0 +1,8 @@
+from django.conf.urls.i18n import i18n_patterns
+from django.urls import path
+
+from tests.urls import empty_view
+
+urlpatterns = i18n_patterns(
+    path('people/<int:person_id>/', empty_view, name='person-item'),
+)